@@ -1,6 +1,10 @@
+import threading
+
 import streamlit as st
 from st_pages import Page, show_pages, add_page_title
-import pandas as pd
+
+from models.registry import registry
+from utils.dataset import DATA_PATH, dataset_report, get_dataset, is_loaded
 
 show_pages(
     [
@@ -19,16 +23,9 @@ st.markdown("# Welcome to the US Car Accident Insights Dashboard")
 def load_csv_with_progress(file_path):
     msg = st.markdown(f"🧪 Loading data from {file_path}...")
     my_bar = st.progress(0)
-    total_rows = sum(1 for _ in open(file_path)) - 1
-    processed_rows = 0
-    chunk_size = 200
 
-    data = pd.DataFrame()
-
-    for chunk in pd.read_csv(file_path, chunksize=chunk_size):
-        data = pd.concat([data, chunk], ignore_index=True)
-        processed_rows += len(chunk)
-        my_bar.progress(processed_rows / total_rows)
+    # Parsed once per process into a compacted frame that every session shares
+    data = get_dataset(file_path, progress=my_bar.progress)
 
     msg.empty()
     my_bar.empty()
@@ -36,43 +33,48 @@ def load_csv_with_progress(file_path):
     return data
 
 
-df = None
+@st.cache_resource
+def warm_up_models():
+    # Runs once per process, models load while the first visitor reads Home
+    thread = threading.Thread(target=registry.warmup, daemon=True)
+    thread.start()
+    return thread
+
 
-if "df" not in st.session_state:
-    df = load_csv_with_progress("./data/US_Accidents_March23_random_sample.csv")
-    st.session_state["df"] = df
+warm_up_models()
+
+if is_loaded(DATA_PATH):
+    df = get_dataset(DATA_PATH)
 else:
-    df = st.session_state["df"]
+    df = load_csv_with_progress(DATA_PATH)
 
-if df is not None:
-    df["Start_Time"] = pd.to_datetime(df["Start_Time"])
-    df["Year"] = df["Start_Time"].dt.year
+report = dataset_report(DATA_PATH)
+saved = report["bytes_before"] - report["bytes_after"]
+st.caption(
+    f"Dataset compacted from {report['bytes_before'] / 2**20:.1f} MB to "
+    f"{report['bytes_after'] / 2**20:.1f} MB ({saved / 2**20:.1f} MB saved)"
+)
 
+if df is not None:
     st.markdown("## How to Use This App")
-    st.markdown(
-        """
+    st.markdown("""
         - Navigate to the **Data Exploration** page to view detailed visualizations by state or city.
         - Use the **Model Training** page to estimate accident severity based on various factors.
         - Interact with the charts and maps for deeper insights.
-    """
-    )
+    """)
 
     st.markdown("## Did You Know?")
-    st.markdown(
-        """
+    st.markdown("""
         - More than 38,000 people die every year in crashes on U.S. roadways.
         - The U.S. traffic fatality rate is 12.4 deaths per 100,000 inhabitants.
         - Seat belts reduce the risk of death by 45% for drivers and front-seat passengers.
-    """
-    )
+    """)
 
     st.markdown("## Quick Data Preview")
     st.write(df.head(15))
 
     st.markdown("## Acknowledgements")
-    st.markdown(
-        """
+    st.markdown("""
         - [Kaggle](https://www.kaggle.com/sobhanmoosavi/us-accidents) for the dataset.
         - [Streamlit](https://streamlit.io) for the amazing app framework.
-    """
-    )
+    """)
@@ -0,0 +1,182 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from models.categorical import categorical_indices, encode_categories
+from models.decision_tree import DecisionTree
+from utils.aggregates import AccidentCube
+from utils.data_loader import load_dataset
+from utils.schema import compact_frame
+from utils.summaries import compute_summaries
+
+DATA_FILES = {
+    "100": "data/US_Accidents_March23_cleaned_100rows.csv",
+    "10k": "data/US_Accidents_March23_cleaned_10000rows.csv",
+}
+SYNTHETIC_ROWS = {"100k": 100_000, "1m": 1_000_000}
+# Columns with too many distinct values to be useful tree features
+ID_COLUMNS = ["Street", "Zipcode", "Airport_Code", "Start_Lat", "Start_Lng"]
+WEATHER_COLUMNS = ["Clear", "Cloud", "Rain", "Heavy_Rain", "Snow", "Heavy_Snow", "Fog"]
+MEASUREMENT_COLUMNS = [
+    "Temperature(F)",
+    "Humidity(%)",
+    "Pressure(in)",
+    "Visibility(mi)",
+    "Wind_Speed(mph)",
+    "Precipitation(in)",
+]
+
+# Each case returns (timed function, rows processed) after its untimed setup
+CASES = {}
+
+
+def case(name):
+    def register(setup):
+        CASES[name] = setup
+        return setup
+
+    return register
+
+
+def cleaned_frame(size):
+    if size in DATA_FILES:
+        return pd.read_csv(DATA_FILES[size])
+
+    # Upsampled from the 10k file, with measurements jittered so rows differ
+    rng = np.random.default_rng(0)
+    base = pd.read_csv(DATA_FILES["10k"])
+    frame = base.iloc[rng.integers(0, len(base), SYNTHETIC_ROWS[size])]
+    frame = frame.reset_index(drop=True)
+    for column in MEASUREMENT_COLUMNS:
+        frame[column] += rng.normal(0, 0.01 * frame[column].std(), len(frame))
+    return frame
+
+
+def tree_data(size):
+    frame = cleaned_frame(size).drop(columns=ID_COLUMNS)
+    y = frame.pop("Severity").to_numpy()
+    encoded, categories = encode_categories(frame)
+    return (
+        encoded.to_numpy(dtype=np.float64),
+        y,
+        categorical_indices(encoded, categories),
+    )
+
+
+def accident_frame(size):
+    # The app's raw sample adds Start_Time, Weather_Condition and ID
+    frame = cleaned_frame(size)
+    frame["Start_Time"] = pd.to_datetime(
+        {
+            "year": frame["Year"],
+            "month": frame["Month"],
+            "day": 1,
+            "hour": frame["Hour"],
+        }
+    )
+    flags = frame[WEATHER_COLUMNS].to_numpy()
+    frame["Weather_Condition"] = np.where(
+        flags.any(axis=1), np.array(WEATHER_COLUMNS)[flags.argmax(axis=1)], None
+    )
+    frame["ID"] = "A-" + frame.index.astype(str)
+    return frame.drop(columns=["Year"])
+
+
+def register_tree_cases(size):
+    @case(f"tree_fit_hist_{size}")
+    def fit_hist():
+        X, y, categorical = tree_data(size)
+        tree = DecisionTree(
+            max_depth=10, max_bins=64, random_state=0, categorical_features=categorical
+        )
+        return lambda: tree.fit(X, y), len(y)
+
+    @case(f"tree_fit_best_first_{size}")
+    def fit_best_first():
+        X, y, categorical = tree_data(size)
+        tree = DecisionTree(
+            max_depth=10,
+            max_bins=64,
+            random_state=0,
+            categorical_features=categorical,
+            min_samples_leaf=20,
+            max_leaf_nodes=256,
+        )
+        return lambda: tree.fit(X, y), len(y)
+
+    @case(f"tree_predict_{size}")
+    def predict():
+        X, y, categorical = tree_data(size)
+        tree = DecisionTree(
+            max_depth=10, max_bins=64, random_state=0, categorical_features=categorical
+        ).fit(X, y)
+        return lambda: tree.predict(X), len(y)
+
+    if size in DATA_FILES:
+        # Exact thresholds scale poorly, so they only run on the real files
+        @case(f"tree_fit_exact_{size}")
+        def fit_exact():
+            X, y, categorical = tree_data(size)
+            tree = DecisionTree(
+                max_depth=10, random_state=0, categorical_features=categorical
+            )
+            return lambda: tree.fit(X, y), len(y)
+
+
+def register_data_cases(size):
+    @case(f"load_csv_cold_{size}")
+    def load_cold():
+        directory, path = _scratch_csv(size)
+
+        def run():
+            shutil.rmtree(os.path.join(directory, ".cache"), ignore_errors=True)
+            return load_dataset(path)
+
+        return run, _count_rows(path)
+
+    @case(f"load_csv_warm_{size}")
+    def load_warm():
+        _, path = _scratch_csv(size)
+        load_dataset(path)
+        return lambda: load_dataset(path), _count_rows(path)
+
+    @case(f"explore_cube_{size}")
+    def explore_cube():
+        frame, _ = compact_frame(accident_frame(size))
+
+        def run():
+            # Build once, then sweep the year slider and its top-5 lists
+            cube = AccidentCube(frame)
+            for year in range(cube.min_year, cube.max_year + 1):
+                cube.year_summary(year)
+                cube.top_cities(year)
+                cube.top_states(year)
+
+        return run, len(frame)
+
+    @case(f"summaries_{size}")
+    def summaries():
+        frame, _ = compact_frame(accident_frame(size))
+        return lambda: compute_summaries(frame), len(frame)
+
+
+def _scratch_csv(size):
+    directory = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, directory, True)
+    path = os.path.join(directory, "accidents.csv")
+    accident_frame(size).to_csv(path, index=False)
+    return directory, path
+
+
+def _count_rows(path):
+    with open(path, "rb") as file:
+        return sum(1 for _ in file) - 1
+
+
+for size in [*DATA_FILES, *SYNTHETIC_ROWS]:
+    register_tree_cases(size)
+    register_data_cases(size)
@@ -0,0 +1,186 @@
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.cases import CASES
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_PATH = os.path.join(BENCHMARK_DIR, "history.json")
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+
+def run_case(name, repeat):
+    # Runs inside a fresh interpreter so cases cannot warm each other's caches
+    timed, rows = CASES[name]()
+    wall_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        timed()
+        wall_times.append(time.perf_counter() - start)
+
+    # One more run under tracemalloc for the memory the call itself needs;
+    # the setup's data and the imports are already allocated and not counted.
+    # NumPy and pandas buffers are traced, Arrow's own memory pool is not
+    tracemalloc.start()
+    timed()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    wall_time = min(wall_times)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+    return {
+        "wall_time": wall_time,
+        "peak_memory_mb": peak_memory / 2**20,
+        # The whole process, setup and imports included
+        "peak_rss_mb": peak_rss / 2**20,
+        "rows": rows,
+        "rows_per_second": rows / wall_time if wall_time else float("inf"),
+    }
+
+
+def run_isolated(name, repeat):
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.run",
+            "--case",
+            name,
+            "--repeat",
+            str(repeat),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode:
+        return {"error": completed.stderr.strip().splitlines()[-1]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None or "error" in result or "error" in reference:
+            continue
+        for metric in ["wall_time", "peak_memory_mb"]:
+            # Baselines from before a metric existed are not compared on it
+            if metric not in reference or not reference[metric]:
+                continue
+            ratio = result[metric] / reference[metric]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    (name, metric, reference[metric], result[metric], ratio)
+                )
+    return regressions
+
+
+def git_commit():
+    completed = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+    )
+    return completed.stdout.strip() or None
+
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_json(path, data):
+    with open(path, "w") as file:
+        json.dump(data, file, indent=2)
+        file.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the DecisionTree and app benchmarks"
+    )
+    parser.add_argument(
+        "patterns", nargs="*", default=["*"], help="glob patterns over case names"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="relative slowdown or memory growth flagged as a regression",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store these results as the baseline for later runs",
+    )
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.repeat)))
+        return 0
+
+    names = [
+        name
+        for name in CASES
+        if any(fnmatch.fnmatch(name, pattern) for pattern in args.patterns)
+    ]
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    results = {}
+    for name in names:
+        results[name] = result = run_isolated(name, args.repeat)
+        if "error" in result:
+            print(f"{name:<28} failed: {result['error']}")
+        else:
+            print(
+                f"{name:<28} {result['wall_time']:9.3f}s"
+                f" {result['peak_memory_mb']:9.1f} MB"
+                f" {result['rows_per_second']:14,.0f} rows/s"
+            )
+
+    history = load_json(HISTORY_PATH, [])
+    history.append(
+        {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results,
+        }
+    )
+    save_json(HISTORY_PATH, history)
+
+    if args.save_baseline:
+        baseline = load_json(BASELINE_PATH, {})
+        baseline.update(results)
+        save_json(BASELINE_PATH, baseline)
+        print(f"Baseline saved to {BASELINE_PATH}")
+        return 0
+
+    baseline = load_json(BASELINE_PATH, None)
+    if baseline is None:
+        print("No baseline yet, store one with --save-baseline")
+        return 0
+    regressions = find_regressions(results, baseline, args.threshold)
+    for name, metric, before, after, ratio in regressions:
+        print(f"REGRESSION {name} {metric}: {before:.3f} -> {after:.3f} ({ratio:.2f}x)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
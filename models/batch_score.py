@@ -0,0 +1,129 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from models.registry import MODEL_PATHS, registry
+from utils.schema import BOOLEAN_COLUMNS, CATEGORY_COLUMNS
+
+# Text and flag fields get fixed dtypes, so every chunk has the same schema
+INPUT_DTYPES = {
+    **{column: str for column in CATEGORY_COLUMNS},
+    **{column: "boolean" for column in BOOLEAN_COLUMNS},
+}
+
+
+def score_csv(
+    input_path,
+    output_path,
+    model_name,
+    chunk_size=100_000,
+    keep_columns=None,
+    progress=None,
+):
+    model = registry.get(model_name)
+    encoder = registry.encoder()
+    classes = model.classes_
+
+    # One feature matrix is reused for every chunk, so memory stays bounded.
+    # It is float64 like the training data: exact-mode thresholds are float64
+    # values, and a float32 copy of a value such as 29.92 can cross them
+    features = np.zeros((chunk_size, len(encoder.columns)), dtype=np.float64)
+    writer = None
+    num_rows = 0
+    start = time.perf_counter()
+    try:
+        for chunk in pd.read_csv(input_path, chunksize=chunk_size, dtype=INPUT_DTYPES):
+            proba = model.predict_proba(encoder.encode_frame(chunk, out=features))
+
+            result = chunk if keep_columns is None else chunk[keep_columns]
+            result = result.reset_index(drop=True)
+            if output_path.endswith(".parquet"):
+                # A numeric column parses as int until a chunk has a missing value
+                numeric = result.select_dtypes(include="number").columns
+                result[numeric] = result[numeric].astype(np.float64)
+            result["Severity"] = classes[np.argmax(proba, axis=1)]
+            for i, severity in enumerate(classes):
+                result[f"Severity_{severity}_proba"] = proba[:, i]
+
+            if output_path.endswith(".parquet"):
+                # Later chunks are cast to the first chunk's schema
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, _output_schema(result))
+                writer.write_table(
+                    pa.Table.from_pandas(
+                        result, schema=writer.schema, preserve_index=False
+                    )
+                )
+            else:
+                result.to_csv(
+                    output_path,
+                    mode="a" if num_rows else "w",
+                    header=not num_rows,
+                    index=False,
+                )
+
+            num_rows += len(chunk)
+            if progress is not None:
+                progress(num_rows, time.perf_counter() - start)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        "rows": num_rows,
+        "seconds": seconds,
+        "rows_per_second": num_rows / seconds if seconds else float("inf"),
+    }
+
+
+def _output_schema(result):
+    # Text columns stay strings even when the first chunk has none of their
+    # values, which pyarrow would otherwise type as null or double
+    schema = pa.Schema.from_pandas(result, preserve_index=False)
+    for column in result.columns[result.dtypes == object]:
+        schema = schema.set(
+            schema.get_field_index(column), pa.field(column, pa.string())
+        )
+    return schema
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Score accident scenarios from a CSV file in chunks"
+    )
+    parser.add_argument("input", help="CSV with the same fields as the prediction form")
+    parser.add_argument("output", help="output .csv or .parquet file")
+    parser.add_argument("--model", choices=list(MODEL_PATHS), default="Random Forest")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument(
+        "--keep-columns",
+        nargs="*",
+        help="input columns copied to the output, all of them by default",
+    )
+    args = parser.parse_args(argv)
+
+    def report(num_rows, seconds):
+        print(f"{num_rows} rows, {num_rows / seconds:.0f} rows/sec", file=sys.stderr)
+
+    stats = score_csv(
+        args.input,
+        args.output,
+        args.model,
+        chunk_size=args.chunk_size,
+        keep_columns=args.keep_columns,
+        progress=report,
+    )
+    print(
+        f"Scored {stats['rows']} rows in {stats['seconds']:.2f}s "
+        f"({stats['rows_per_second']:.0f} rows/sec)"
+    )
+
+
+if __name__ == "__main__":
+    main()
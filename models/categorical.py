@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+
+def encode_categories(df, categories=None):
+    # Replace string columns with integer codes for DecisionTree's
+    # categorical_features. Missing values get their own code, one past the
+    # last label, so the tree can learn where they go; values missing from
+    # `categories` become -1, which the tree sends right
+    if categories is None:
+        columns = df.select_dtypes(include=["object", "category", "string"]).columns
+        categories = {
+            column: sorted(df[column].dropna().unique().tolist()) for column in columns
+        }
+
+    encoded = df.copy()
+    for column, labels in categories.items():
+        codes = pd.Categorical(df[column], categories=labels).codes.astype(np.int32)
+        codes[df[column].isna().to_numpy()] = len(labels)
+        encoded[column] = codes
+    return encoded, categories
+
+
+def categorical_indices(df, categories):
+    return [df.columns.get_loc(column) for column in categories]
@@ -1,135 +1,891 @@
+import copy
+import heapq
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import nullcontext
+
 import numpy as np
 
+from models.shared_memory import (
+    attach_array,
+    feature_array,
+    resolve_n_jobs,
+    shared_arrays,
+)
+from models.tree_stats import TreeStats
+
 
 class DecisionTree:
     def __init__(
-        self, max_depth=None, feature_sampling_factor=1.0, threshold_sampling_factor=1.0
+        self,
+        max_depth=None,
+        feature_sampling_factor=1.0,
+        threshold_sampling_factor=1.0,
+        max_bins=None,
+        random_state=None,
+        n_jobs=None,
+        categorical_features=None,
+        min_samples_split=2,
+        min_samples_leaf=1,
+        min_impurity_decrease=0.0,
+        max_leaf_nodes=None,
+        instrument=False,
+        progress=None,
     ):
         self.max_depth = max_depth
         self.feature_sampling_factor = feature_sampling_factor
         self.threshold_sampling_factor = threshold_sampling_factor
+        # None searches exact thresholds, an int enables histogram training
+        self.max_bins = max_bins
+        # With a random_state every node draws from its own generator, so the
+        # tree no longer depends on the order in which nodes are built
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+        # Indices of columns holding non-negative integer category codes
+        self.categorical_features = categorical_features
+        self.min_samples_split = min_samples_split
+        self.min_samples_leaf = min_samples_leaf
+        # Entropy decrease in bits, weighted by the node's share of the samples
+        self.min_impurity_decrease = min_impurity_decrease
+        # Grows best-first, expanding the most promising leaf each time
+        self.max_leaf_nodes = max_leaf_nodes
+        # Collect a TreeStats into stats_ while fitting and predicting
+        self.instrument = instrument
+        # Called as progress(samples_done, total_samples) as leaves are settled
+        self.progress = progress
+
+    def __getstate__(self):
+        # Callbacks stay in the process that set them, and parallel workers
+        # read the sample indices from shared memory rather than a pickled copy
+        state = self.__dict__.copy()
+        state["progress"] = None
+        state.pop("_indices", None)
+        return state
 
-    def fit(self, X, y):
-        self.classes_ = np.unique(y)
+    def fit(self, X, y, sample_indices=None, bin_edges=None):
+        # X is only ever read, so a read-only np.memmap works as well as an
+        # in-memory array; nodes own slices of one permutation of row indices.
+        # With bin_edges, X is already binned with them and fits that share
+        # the data skip the binning
+        if bin_edges is not None and self.max_bins is None:
+            raise ValueError("bin_edges requires histogram training (max_bins)")
+        X = feature_array(X)
+        y = np.asarray(y)
+        self.stats_ = TreeStats() if self.instrument else None
+        fit_start = time.perf_counter()
+
+        self.classes_ = np.unique(y if sample_indices is None else y[sample_indices])
         self.num_classes_ = len(self.classes_)
-        self.tree = self._build_tree(X, y)
+        self.n_features_in_ = X.shape[1]
+        self.is_categorical_ = np.zeros(self.n_features_in_, dtype=bool)
+        if self.categorical_features is not None:
+            self.is_categorical_[self.categorical_features] = True
+            if bin_edges is None:
+                self._check_category_codes(X)
+        y_codes = np.searchsorted(self.classes_, y)
+        if sample_indices is None:
+            self._indices = np.arange(len(y))
+        else:
+            self._indices = np.array(sample_indices, dtype=np.intp)
+        self._num_samples = len(self._indices)
+        self._samples_done = 0
+
+        n_jobs = resolve_n_jobs(self.n_jobs)
+        self._seed = self.random_state
+        if self._seed is None and n_jobs > 1:
+            self._seed = np.random.randint(np.iinfo(np.int32).max)
+
+        histogram = None
+        if self.max_bins is not None:
+            if bin_edges is None:
+                self.bin_edges_ = self._compute_bin_edges(X, self._indices)
+                with self._timer("binning"):
+                    X = self._bin_features(X)
+            else:
+                self.bin_edges_ = bin_edges
+            num_bins = [len(edges) + 1 for edges in self.bin_edges_]
+            self.bin_offsets_ = np.cumsum([0] + num_bins)
+            self.bin_features_ = np.repeat(np.arange(len(num_bins)), num_bins)
+            histogram = self._calculate_histogram(X, y_codes, self._indices)
+
+        if n_jobs > 1:
+            self.tree = self._build_tree_parallel(X, y_codes, histogram, n_jobs)
+        elif self.max_leaf_nodes is not None:
+            self.tree = self._build_tree_best_first(X, y_codes, histogram)
+        else:
+            self.tree = self._build_tree(X, y_codes, 0, len(self._indices), histogram)
+        self._compiled = self._compile_tree(self.tree)
+        del self._indices
+        if self.stats_ is not None:
+            self.stats_.fit_seconds = time.perf_counter() - fit_start
+        return self
+
+    def bin(self, X):
+        # Bins X the way fit does; fits sharing the result pass bin_edges
+        if self.max_bins is None:
+            raise ValueError("bin requires histogram training, set max_bins")
+        X = feature_array(X)
+        self.is_categorical_ = np.zeros(X.shape[1], dtype=bool)
+        if self.categorical_features is not None:
+            self.is_categorical_[self.categorical_features] = True
+            self._check_category_codes(X)
+        self.bin_edges_ = self._compute_bin_edges(X, np.arange(len(X)))
+        return self._bin_features(X), self.bin_edges_
+
+    def _check_category_codes(self, X):
+        # Negative codes only mean "unseen" at predict time, where they go right;
+        # in training they would be counted as category 0 or break bincount
+        features = np.flatnonzero(self.is_categorical_)
+        if (np.asarray(X[:, features], dtype=np.float64) < 0).any():
+            raise ValueError(
+                "Categorical features must hold non-negative codes, give missing "
+                "values a code of their own (see models.categorical)"
+            )
 
     def predict(self, X):
-        return np.array([self.classes_[self._traverse_tree(x, self.tree)] for x in X])
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
 
     def predict_proba(self, X):
-        return np.array([self._traverse_tree_proba(x, self.tree) for x in X])
+        return self._get_compiled()["value"][self.apply(X)]
+
+    def apply(self, X):
+        # Advance every row one level per step instead of walking rows one by one
+        compiled = self._get_compiled()
+        X = np.asarray(X)
+        start = time.perf_counter()
+
+        nodes = np.zeros(len(X), dtype=np.intp)
+        active = np.flatnonzero(~compiled["is_leaf"][nodes])
+        while len(active) > 0:
+            current = nodes[active]
+            # Mixed bool/numeric frames arrive as object arrays
+            values = X[active, compiled["feature"][current]].astype(np.float64)
+            go_left = values <= compiled["threshold"][current]
+
+            # Categorical nodes look the code up in their row of the mask;
+            # codes never seen in training go right
+            category_rows = compiled["category_row"][current]
+            categorical = category_rows >= 0
+            if categorical.any():
+                category_mask = compiled["category_mask"]
+                codes = values[categorical]
+                known = (codes >= 0) & (codes < category_mask.shape[1])
+                in_left = np.zeros(len(codes), dtype=bool)
+                in_left[known] = category_mask[
+                    category_rows[categorical][known], codes[known].astype(np.intp)
+                ]
+                go_left[categorical] = in_left
+
+            nodes[active] = np.where(
+                go_left, compiled["left"][current], compiled["right"][current]
+            )
+            active = active[~compiled["is_leaf"][nodes[active]]]
+
+        # Trees pickled before instrumentation existed have no stats_
+        stats = getattr(self, "stats_", None)
+        if stats is not None:
+            stats.record_inference(len(X), time.perf_counter() - start)
+        return nodes
+
+    def truncate(self, max_depth):
+        # A copy that stops descending at max_depth; with a random_state it
+        # predicts like the same tree refitted with that max_depth
+        compiled = dict(self._get_compiled())
+        cut = ~compiled["is_leaf"] & (self._node_depths(compiled) >= max_depth)
+        # Split nodes built before truncation existed compile to all-zero rows
+        if not compiled["value"][cut].any(axis=1).all():
+            raise ValueError(
+                "This tree was fitted before split nodes stored their class "
+                "distribution, refit it to truncate it"
+            )
+        compiled["is_leaf"] = compiled["is_leaf"] | cut
+        tree = copy.copy(self)
+        tree.max_depth = max_depth
+        tree.tree = None
+        tree.stats_ = None
+        tree._compiled = compiled
+        return tree
+
+    def _node_depths(self, compiled):
+        depths = np.zeros(len(compiled["is_leaf"]), dtype=np.intp)
+        level = np.array([0])
+        depth = 0
+        while len(level) > 0:
+            depths[level] = depth
+            internal = level[~compiled["is_leaf"][level]]
+            level = np.concatenate(
+                (compiled["left"][internal], compiled["right"][internal])
+            )
+            depth += 1
+        return depths
+
+    def _get_compiled(self):
+        # Trees pickled before compilation existed only carry the nested dict
+        if getattr(self, "_compiled", None) is None:
+            self._compiled = self._compile_tree(self.tree)
+        return self._compiled
+
+    def _flatten_tree(self, tree):
+        # Pre-order, so position i here is node i of the compiled arrays
+        nodes = []
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            if not node.get("leaf"):
+                stack.append(node["right"])
+                stack.append(node["left"])
+        return nodes
+
+    def _compile_tree(self, tree):
+        nodes = self._flatten_tree(tree)
+        node_ids = {id(node): i for i, node in enumerate(nodes)}
+        num_nodes = len(nodes)
+        categorical_nodes = [node for node in nodes if "categories" in node]
+        num_categories = max(
+            (node["categories"].max() + 1 for node in categorical_nodes), default=0
+        )
+        compiled = {
+            "feature": np.full(num_nodes, -1, dtype=np.intp),
+            "threshold": np.full(num_nodes, np.nan),
+            "left": np.full(num_nodes, -1, dtype=np.intp),
+            "right": np.full(num_nodes, -1, dtype=np.intp),
+            "is_leaf": np.zeros(num_nodes, dtype=bool),
+            "value": np.zeros((num_nodes, self.num_classes_)),
+            # Row into category_mask for categorical splits, -1 otherwise
+            "category_row": np.full(num_nodes, -1, dtype=np.intp),
+            "category_mask": np.zeros(
+                (len(categorical_nodes), num_categories), dtype=bool
+            ),
+        }
+        category_row = 0
+        for i, node in enumerate(nodes):
+            # Split nodes built before truncation existed have no distribution
+            if "class_distribution" in node:
+                compiled["value"][i] = node["class_distribution"]
+            if node.get("leaf"):
+                compiled["is_leaf"][i] = True
+                continue
+
+            compiled["feature"][i] = node["feature"]
+            compiled["left"][i] = node_ids[id(node["left"])]
+            compiled["right"][i] = node_ids[id(node["right"])]
+            if "categories" in node:
+                compiled["category_row"][i] = category_row
+                compiled["category_mask"][category_row, node["categories"]] = True
+                category_row += 1
+            else:
+                compiled["threshold"][i] = node["threshold"]
+
+        return compiled
+
+    def _node_rng(self, node_id, slot=0):
+        # Legacy behaviour: draw from the global np.random stream in build order
+        if self._seed is None:
+            return np.random
+        # One key per (node, slot); slot 0 samples features, f + 1 feature f
+        return np.random.default_rng(
+            [self._seed, node_id * (self.n_features_in_ + 1) + slot]
+        )
 
-    def _build_tree(self, X, y, depth=0):
-        num_labels = len(np.unique(y))
+    def _make_leaf(self, class_counts):
+        leaf_distribution = np.zeros(self.num_classes_)
+        if class_counts.sum() > 0:
+            leaf_distribution = class_counts / class_counts.sum()
+        return {"leaf": True, "class_distribution": leaf_distribution}
+
+    def _timer(self, phase):
+        if self.stats_ is None:
+            return nullcontext()
+        return self.stats_.timer(phase)
+
+    def _record_leaf(self, depth, num_rows):
+        if self.stats_ is not None:
+            self.stats_.record_node(depth, leaf=True)
+        self._report_progress(num_rows)
+
+    def _report_progress(self, num_rows):
+        self._samples_done += num_rows
+        if self.progress is not None:
+            self.progress(self._samples_done, self._num_samples)
+
+    def _build_tree(
+        self, X, y_codes, start, end, histogram=None, depth=0, node_id=0, pool=None
+    ):
+        # The node's samples are self._indices[start:end]; X is never copied
+        rows = self._indices[start:end]
+        class_counts = np.bincount(y_codes[rows], minlength=self.num_classes_)
 
         # Base case: Leaf node (return class distribution as probabilities)
-        if depth == self.max_depth or num_labels == 1 or len(y) == 0:
-            leaf_distribution = np.zeros(self.num_classes_)
-            if len(y) > 0:
-                unique_classes, counts = np.unique(y, return_counts=True)
-                leaf_distribution[np.searchsorted(self.classes_, unique_classes)] = (
-                    counts / len(y)
+        if self._is_terminal(depth, class_counts):
+            self._record_leaf(depth, len(rows))
+            return self._make_leaf(class_counts)
+        if pool is not None and depth >= self._frontier:
+            # The worker partitions its own slice of the shared indices
+            return pool.submit(
+                _build_subtree_task, start, end, histogram, depth, node_id
+            )
+
+        split = self._search_split(
+            X, y_codes, start, end, class_counts, histogram, node_id, pool
+        )
+        if split is None:
+            self._record_leaf(depth, len(rows))
+            return self._make_leaf(class_counts)
+        _, best_feature, best_split = split
+        if self.stats_ is not None:
+            self.stats_.record_node(depth, leaf=False)
+
+        middle, left_histogram, right_histogram = self._split_node(
+            X, y_codes, start, end, best_feature, best_split, histogram, depth
+        )
+        left_tree = self._build_tree(
+            X, y_codes, start, middle, left_histogram, depth + 1, 2 * node_id + 1, pool
+        )
+        right_tree = self._build_tree(
+            X, y_codes, middle, end, right_histogram, depth + 1, 2 * node_id + 2, pool
+        )
+        return self._make_split(
+            best_feature, best_split, left_tree, right_tree, class_counts
+        )
+
+    def _build_tree_best_first(self, X, y_codes, histogram=None, pool=None):
+        # Candidate leaves wait in a heap keyed by how much splitting them
+        # lowers the total weighted entropy; the best one is expanded until
+        # max_leaf_nodes leaves exist, whatever is left stays a leaf
+        root = {}
+        candidates = []
+        self._push_candidate(
+            candidates, root, X, y_codes, 0, len(self._indices), histogram, 0, 0, pool
+        )
+        num_leaves = 1
+        while candidates and num_leaves < self.max_leaf_nodes:
+            _, node_id, candidate = heapq.heappop(candidates)
+            node, start, end, histogram, depth, feature, split, class_counts = candidate
+            if self.stats_ is not None:
+                self.stats_.record_node(depth, leaf=False)
+            middle, left_histogram, right_histogram = self._split_node(
+                X, y_codes, start, end, feature, split, histogram, depth
+            )
+            left, right = {}, {}
+            node.update(self._make_split(feature, split, left, right, class_counts))
+            num_leaves += 1
+            for child, child_start, child_end, child_histogram, child_id in [
+                (left, start, middle, left_histogram, 2 * node_id + 1),
+                (right, middle, end, right_histogram, 2 * node_id + 2),
+            ]:
+                self._push_candidate(
+                    candidates,
+                    child,
+                    X,
+                    y_codes,
+                    child_start,
+                    child_end,
+                    child_histogram,
+                    depth + 1,
+                    child_id,
+                    pool,
                 )
-            return {"leaf": True, "class_distribution": leaf_distribution}
 
-        best_feature, best_threshold = self._find_best_split(X, y)
+        for _, _, (node, start, end, _, depth, _, _, class_counts) in candidates:
+            self._record_leaf(depth, end - start)
+            node.update(self._make_leaf(class_counts))
+        return root
 
-        # Split the data
-        left_indices = X[:, best_feature] <= best_threshold
-        right_indices = X[:, best_feature] > best_threshold
+    def _push_candidate(
+        self, candidates, node, X, y_codes, start, end, histogram, depth, node_id, pool
+    ):
+        # Nodes that cannot split become leaves right away
+        rows = self._indices[start:end]
+        class_counts = np.bincount(y_codes[rows], minlength=self.num_classes_)
+        split = None
+        if not self._is_terminal(depth, class_counts):
+            split = self._search_split(
+                X, y_codes, start, end, class_counts, histogram, node_id, pool
+            )
+        if split is None:
+            self._record_leaf(depth, len(rows))
+            node.update(self._make_leaf(class_counts))
+            return
 
-        left_tree = self._build_tree(X[left_indices], y[left_indices], depth + 1)
-        right_tree = self._build_tree(X[right_indices], y[right_indices], depth + 1)
+        gain, feature, threshold = split
+        # node_id breaks ties, so the order never depends on the node dicts
+        heapq.heappush(
+            candidates,
+            (
+                -gain * len(rows),
+                node_id,
+                (node, start, end, histogram, depth, feature, threshold, class_counts),
+            ),
+        )
 
-        return {
-            "feature": best_feature,
-            "threshold": best_threshold,
-            "left": left_tree,
-            "right": right_tree,
-            "leaf": False,
-        }
+    def _is_terminal(self, depth, class_counts):
+        return np.count_nonzero(class_counts) <= 1 or self._is_too_small(
+            depth, class_counts.sum()
+        )
 
-    def _find_best_split(self, X, y):
-        best_gain = 0
-        best_feature = None
-        best_threshold = None
+    def _search_split(
+        self, X, y_codes, start, end, class_counts, histogram, node_id, pool
+    ):
+        with self._timer("split_search"):
+            if histogram is None:
+                gain, feature, split = self._find_best_split(
+                    X, y_codes, start, end, class_counts, node_id, pool
+                )
+            else:
+                gain, feature, split = self._find_best_histogram_split(
+                    histogram, class_counts, node_id
+                )
+        if feature is None:
+            return None
+        # min_impurity_decrease is weighted by the node's share of the samples
+        if gain * (end - start) < self.min_impurity_decrease * self._num_samples:
+            return None
+        return gain, feature, split
 
-        num_samples, num_features = X.shape
-        sampled_features = np.random.choice(
-            num_features,
-            int(self.feature_sampling_factor * num_features),
+    def _split_node(self, X, y_codes, start, end, feature, split, histogram, depth):
+        with self._timer("partition"):
+            middle = self._partition(X, start, end, feature, split)
+        if histogram is None:
+            return middle, None, None
+
+        # Children that will be leaves anyway need no histogram
+        if self._is_too_small(depth + 1, middle - start) and self._is_too_small(
+            depth + 1, end - middle
+        ):
+            return middle, None, None
+
+        # Only the smaller child is scanned, its sibling is parent - child
+        if middle - start <= end - middle:
+            left_histogram = self._calculate_histogram(
+                X, y_codes, self._indices[start:middle]
+            )
+            return middle, left_histogram, histogram - left_histogram
+        right_histogram = self._calculate_histogram(
+            X, y_codes, self._indices[middle:end]
+        )
+        return middle, histogram - right_histogram, right_histogram
+
+    def _is_too_small(self, depth, num_samples):
+        # No split of fewer than 2 * min_samples_leaf samples is allowed
+        return (
+            depth == self.max_depth
+            or num_samples < self.min_samples_split
+            or num_samples < 2 * self.min_samples_leaf
+        )
+
+    def _make_split(self, feature, split, left, right, class_counts):
+        node = {"feature": feature, "left": left, "right": right}
+        # Internal nodes keep their distribution too, so a tree can be truncated
+        node["class_distribution"] = self._make_leaf(class_counts)["class_distribution"]
+        if self.is_categorical_[feature]:
+            node["categories"] = split
+        elif self.max_bins is not None:
+            node["threshold"] = self.bin_edges_[feature][split]
+        else:
+            node["threshold"] = split
+        node["leaf"] = False
+        return node
+
+    def _partition(self, X, start, end, feature, split):
+        # Stable in-place partition of the node's index slice, left rows first
+        rows = self._indices[start:end]
+        if self.is_categorical_[feature]:
+            go_left = np.isin(X[rows, feature], split)
+        else:
+            go_left = X[rows, feature] <= split
+        left_rows, right_rows = rows[go_left], rows[~go_left]
+        if self.stats_ is not None:
+            # The gathered column and both index halves
+            self.stats_.record_copy(len(rows) * X.itemsize + rows.nbytes)
+        middle = start + len(left_rows)
+        self._indices[start:middle] = left_rows
+        self._indices[middle:end] = right_rows
+        return middle
+
+    def _find_best_split(
+        self, X, y_codes, start, end, class_counts, node_id=0, pool=None
+    ):
+        sampled_features = self._node_rng(node_id).choice(
+            self.n_features_in_,
+            int(self.feature_sampling_factor * self.n_features_in_),
             replace=False,
         )
 
-        for feature in sampled_features:
-            thresholds = np.unique(X[:, feature])
-            sampled_thresholds = np.random.choice(
-                thresholds,
-                int(self.threshold_sampling_factor * len(thresholds)),
-                replace=False,
+        if pool is None:
+            return self._evaluate_features(
+                X,
+                y_codes,
+                self._indices[start:end],
+                class_counts,
+                sampled_features,
+                node_id,
             )
 
-            for threshold in sampled_thresholds:
-                gain = self._calculate_gain(X, y, feature, threshold)
+        # Workers read the node's rows from the shared indices, only the
+        # slice bounds and the feature chunk are sent
+        chunks = np.array_split(sampled_features, self._n_jobs)
+        best_gain, best_feature, best_threshold = 0, None, None
+        # Keep the first strictly better chunk so ties resolve as in serial
+        for gain, feature, threshold, stats in pool.map(
+            _evaluate_features_task,
+            [start] * len(chunks),
+            [end] * len(chunks),
+            [class_counts] * len(chunks),
+            chunks,
+            [node_id] * len(chunks),
+        ):
+            if stats is not None:
+                self.stats_.merge(stats)
+            if feature is not None and gain > best_gain:
+                best_gain, best_feature, best_threshold = gain, feature, threshold
+        return best_gain, best_feature, best_threshold
+
+    def _evaluate_features(self, X, y_codes, rows, class_counts, features, node_id):
+        best_gain = 0
+        best_feature = None
+        best_threshold = None
+
+        node_codes = y_codes[rows]
+        parent_entropy = self._calculate_entropies(class_counts[None, :])[0]
+        if self.stats_ is not None:
+            # One gathered column per feature, plus the node's labels
+            self.stats_.record_copy(
+                node_codes.nbytes + len(features) * len(rows) * X.itemsize
+            )
 
+        for feature in features:
+            if self.is_categorical_[feature]:
+                gain, categories = self._evaluate_categorical_feature(
+                    X[rows, feature], node_codes, parent_entropy, feature, node_id
+                )
                 if gain > best_gain:
                     best_gain = gain
                     best_feature = feature
-                    best_threshold = threshold
+                    best_threshold = categories
+                continue
 
-        return best_feature, best_threshold
+            # Sort the column once; every threshold then splits off a prefix
+            thresholds, inverse = np.unique(X[rows, feature], return_inverse=True)
+            sampled_thresholds = self._sample_thresholds(
+                len(thresholds), node_id, feature
+            )
+            if len(sampled_thresholds) == 0:
+                continue
+
+            # Class counts of the samples equal to each distinct value
+            counts = np.bincount(
+                inverse * self.num_classes_ + node_codes,
+                minlength=len(thresholds) * self.num_classes_,
+            ).reshape(len(thresholds), self.num_classes_)
+
+            # Row i of the cumulative counts holds every sample <= thresholds[i]
+            cumulative_counts = np.cumsum(counts, axis=0)
+            left_counts = cumulative_counts[sampled_thresholds]
+            right_counts = cumulative_counts[-1] - left_counts
+
+            gains = self._calculate_gains(
+                left_counts, right_counts, parent_entropy, node_id
+            )
+            best_index = np.argmax(gains)
+
+            if gains[best_index] > best_gain:
+                best_gain = gains[best_index]
+                best_feature = feature
+                best_threshold = thresholds[sampled_thresholds[best_index]]
+
+        return best_gain, best_feature, best_threshold
+
+    def _evaluate_categorical_feature(
+        self, column, node_codes, parent_entropy, feature, node_id
+    ):
+        categories = column.astype(np.intp)
+        counts = np.bincount(
+            categories * self.num_classes_ + node_codes,
+            minlength=(categories.max() + 1) * self.num_classes_,
+        ).reshape(-1, self.num_classes_)
+        present = np.flatnonzero(counts.sum(axis=1))
+        counts = counts[present]
+
+        # Order categories by their mean class so that every candidate split
+        # sends a prefix of similarly distributed categories left
+        mean_class = counts @ np.arange(self.num_classes_) / counts.sum(axis=1)
+        order = np.argsort(mean_class, kind="stable")
+        sampled_prefixes = self._sample_thresholds(len(present), node_id, feature)
+        if len(sampled_prefixes) == 0:
+            return 0, None
+
+        cumulative_counts = np.cumsum(counts[order], axis=0)
+        left_counts = cumulative_counts[sampled_prefixes]
+        right_counts = cumulative_counts[-1] - left_counts
+
+        gains = self._calculate_gains(
+            left_counts, right_counts, parent_entropy, node_id
+        )
+        best_index = np.argmax(gains)
+        left_categories = present[order[: sampled_prefixes[best_index] + 1]]
+        return gains[best_index], np.sort(left_categories)
+
+    def _sample_thresholds(self, num_thresholds, node_id, feature):
+        num_sampled = int(self.threshold_sampling_factor * num_thresholds)
+        if self._seed is None:
+            return np.random.choice(num_thresholds, num_sampled, replace=False)
+        if num_sampled == num_thresholds:
+            return np.arange(num_thresholds)
+        return self._node_rng(node_id, feature + 1).choice(
+            num_thresholds, num_sampled, replace=False
+        )
 
-    def _calculate_gain(self, X, y, feature, threshold):
-        parent_entropy = self._calculate_entropy(y)
+    def _build_tree_parallel(self, X, y_codes, histogram, n_jobs):
+        # Levels above the frontier split in the parent, evaluating features
+        # across workers; every node on the frontier becomes one worker task
+        self._n_jobs = n_jobs
+        self._frontier = int(np.ceil(np.log2(n_jobs))) + 1
+        # The index permutation is shared too: the parent partitions it above
+        # the frontier and every subtree task partitions its own slice
+        with shared_arrays(X, y_codes, self._indices) as specs:
+            block, self._indices = attach_array(specs[2], writeable=True)
+            try:
+                with ProcessPoolExecutor(
+                    n_jobs, initializer=_init_worker, initargs=(self, specs)
+                ) as pool:
+                    if self.max_leaf_nodes is not None:
+                        # Best-first growth has no frontier, workers only
+                        # score features
+                        return self._build_tree_best_first(X, y_codes, histogram, pool)
+                    tree = self._build_tree(
+                        X, y_codes, 0, len(self._indices), histogram, pool=pool
+                    )
+                    return _resolve_subtrees(tree, self._collect_subtree)
+            finally:
+                # The view has to go before the block can be closed
+                self._indices = None
+                block.close()
 
-        left_indices = X[:, feature] <= threshold
-        right_indices = X[:, feature] > threshold
+    def _collect_subtree(self, result):
+        subtree, stats, num_rows = result
+        if stats is not None:
+            self.stats_.merge(stats)
+        self._report_progress(num_rows)
+        return subtree
 
-        left_entropy = self._calculate_entropy(y[left_indices])
-        right_entropy = self._calculate_entropy(y[right_indices])
+    def _calculate_gains(self, left_counts, right_counts, parent_entropy, node_id=0):
+        if self.stats_ is None:
+            return self._score_splits(left_counts, right_counts, parent_entropy)
+        self.stats_.record_thresholds(node_id, len(left_counts))
+        with self.stats_.timer("entropy_gain"):
+            return self._score_splits(left_counts, right_counts, parent_entropy)
 
-        num_left = len(y[left_indices])
-        num_right = len(y[right_indices])
+    def _score_splits(self, left_counts, right_counts, parent_entropy):
+        num_left = left_counts.sum(axis=1)
+        num_right = right_counts.sum(axis=1)
         total_samples = num_left + num_right
 
         gain = (
             parent_entropy
-            - ((num_left / total_samples) * left_entropy)
-            - ((num_right / total_samples) * right_entropy)
+            - ((num_left / total_samples) * self._calculate_entropies(left_counts))
+            - ((num_right / total_samples) * self._calculate_entropies(right_counts))
         )
+        if self.min_samples_leaf > 1:
+            # Splits leaving a child too small can never be chosen
+            too_small = np.minimum(num_left, num_right) < self.min_samples_leaf
+            gain[too_small] = -np.inf
 
         return gain
 
-    def _calculate_entropy(self, y):
-        if len(y) == 0:
-            return 0
-        _, counts = np.unique(y, return_counts=True)
-        probabilities = counts / len(y)
-        entropy = -np.sum(probabilities * np.log2(probabilities + 1e-10))
+    def _compute_bin_edges(self, X, rows):
+        # Bin b of a feature holds the values in (edges[b - 1], edges[b]]
+        bin_edges = []
+        for feature in range(X.shape[1]):
+            column = np.asarray(X[rows, feature], dtype=np.float64)
+            if self.is_categorical_[feature]:
+                # One bin per category code
+                bin_edges.append(np.arange(column.max(), dtype=np.float64))
+                continue
+            values = np.unique(column)
+            if len(values) <= self.max_bins:
+                edges = values[:-1]
+            else:
+                quantiles = np.linspace(0, 1, self.max_bins + 1)[1:-1]
+                edges = np.unique(np.quantile(column, quantiles, method="lower"))
+            bin_edges.append(edges)
+        return bin_edges
+
+    def _bin_features(self, X):
+        num_bins = max(len(edges) + 1 for edges in self.bin_edges_)
+        # Categorical features get one bin per code, whatever max_bins says
+        if num_bins <= 2**8:
+            dtype = np.uint8
+        elif num_bins <= 2**16:
+            dtype = np.uint16
+        else:
+            dtype = np.uint32
+        X_binned = np.empty(X.shape, dtype=dtype)
+        for feature, edges in enumerate(self.bin_edges_):
+            column = np.asarray(X[:, feature], dtype=np.float64)
+            X_binned[:, feature] = np.searchsorted(edges, column, side="left")
+        return X_binned
+
+    def _calculate_histogram(self, X_binned, y_codes, rows, chunk_size=65536):
+        # Class counts for every (feature, bin) pair, flattened over features
+        histogram = np.zeros(self.bin_offsets_[-1] * self.num_classes_, dtype=np.int64)
+        with self._timer("histogram"):
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start : start + chunk_size]
+                gathered = X_binned[chunk]
+                if self.stats_ is not None:
+                    self.stats_.record_copy(gathered.nbytes)
+                bins = gathered + self.bin_offsets_[:-1]
+                keys = bins * self.num_classes_ + y_codes[chunk, None]
+                histogram += np.bincount(keys.ravel(), minlength=len(histogram))
+        return histogram.reshape(-1, self.num_classes_)
+
+    def _find_best_histogram_split(self, histogram, class_counts, node_id=0):
+        rng = self._node_rng(node_id)
+        num_features = len(self.bin_edges_)
+        sampled_features = rng.choice(
+            num_features,
+            int(self.feature_sampling_factor * num_features),
+            replace=False,
+        )
+
+        # Categorical bins are reordered by class distribution within their
+        # feature, numeric bins keep their natural order
+        order = None
+        if self.is_categorical_.any():
+            order = self._order_histogram_bins(histogram)
+            histogram = histogram[order]
+
+        # Every (feature, bin) candidate is scored in one pass over the flat
+        # histogram; the last bin of a feature has no upper edge to split on
+        is_sampled = np.zeros(num_features, dtype=bool)
+        is_sampled[sampled_features] = True
+        is_last_bin = np.zeros(len(histogram), dtype=bool)
+        is_last_bin[self.bin_offsets_[1:] - 1] = True
+        candidates = np.flatnonzero(
+            histogram.any(axis=1) & ~is_last_bin & is_sampled[self.bin_features_]
+        )
+        if self.threshold_sampling_factor < 1.0:
+            candidates = self._sample_histogram_bins(candidates, rng)
+        if len(candidates) == 0:
+            return 0, None, None
+
+        cumulative_counts = np.cumsum(histogram, axis=0)
+        feature_starts = np.vstack(
+            (np.zeros(self.num_classes_, dtype=np.int64), cumulative_counts)
+        )[self.bin_offsets_[:-1]]
+        left_counts = (
+            cumulative_counts[candidates]
+            - feature_starts[self.bin_features_[candidates]]
+        )
+        right_counts = class_counts - left_counts
+
+        parent_entropy = self._calculate_entropies(class_counts[None, :])[0]
+        gains = self._calculate_gains(
+            left_counts, right_counts, parent_entropy, node_id
+        )
+        best_index = np.argmax(gains)
+        best_gain = gains[best_index]
+        if best_gain <= 0:
+            return 0, None, None
+
+        position = candidates[best_index]
+        best_feature = self.bin_features_[position]
+        start = self.bin_offsets_[best_feature]
+        if self.is_categorical_[best_feature]:
+            occupied = histogram[start : position + 1].any(axis=1)
+            categories = np.sort(order[start : position + 1][occupied] - start)
+            return best_gain, best_feature, categories
+        return best_gain, best_feature, position - start
+
+    def _order_histogram_bins(self, histogram):
+        keys = np.arange(len(histogram), dtype=np.float64)
+        totals = histogram.sum(axis=1)
+        mean_class = np.divide(
+            histogram @ np.arange(self.num_classes_),
+            totals,
+            out=np.full(len(histogram), np.inf),
+            where=totals > 0,
+        )
+        categorical_bins = self.is_categorical_[self.bin_features_]
+        keys[categorical_bins] = mean_class[categorical_bins]
+        return np.lexsort((keys, self.bin_features_))
+
+    def _sample_histogram_bins(self, candidates, rng):
+        # Keep int(threshold_sampling_factor * n) random bins of every feature
+        features = self.bin_features_[candidates]
+        order = np.lexsort((rng.random(len(candidates)), features))
+        sorted_features = features[order]
+        rank = np.arange(len(order)) - np.searchsorted(sorted_features, sorted_features)
+        quota = (
+            self.threshold_sampling_factor
+            * np.bincount(features, minlength=len(self.bin_edges_))
+        ).astype(int)
+        return candidates[np.sort(order[rank < quota[sorted_features]])]
+
+    def _calculate_entropies(self, counts):
+        totals = counts.sum(axis=1, keepdims=True)
+        probabilities = np.divide(
+            counts, totals, out=np.zeros(counts.shape), where=totals > 0
+        )
+        entropy = -np.sum(probabilities * np.log2(probabilities + 1e-10), axis=1)
 
         return entropy
 
-    def _traverse_tree(self, x, tree):
-        if tree.get("leaf"):
-            return np.argmax(tree["class_distribution"])
-        else:
-            feature = tree["feature"]
-            threshold = tree["threshold"]
 
-            if x[feature] <= threshold:
-                return self._traverse_tree(x, tree["left"])
-            else:
-                return self._traverse_tree(x, tree["right"])
+# Worker-side state for parallel fits: the unfitted tree and the shared arrays
+_worker = {}
+
+
+def _init_worker(tree, specs):
+    # Forked workers inherit the callback, but progress is reported by the parent
+    tree.progress = None
+    _worker["tree"] = tree
+    X_spec, y_spec, indices_spec = specs
+    _worker["shared"] = [
+        attach_array(X_spec),
+        attach_array(y_spec),
+        attach_array(indices_spec, writeable=True),
+    ]
+
+
+def _reset_worker_stats(tree):
+    # Every task counts from zero; the parent merges what it sends back
+    tree.stats_ = TreeStats() if tree.instrument else None
+    return tree
+
+
+def _evaluate_features_task(start, end, class_counts, features, node_id):
+    tree = _reset_worker_stats(_worker["tree"])
+    (_, X), (_, y_codes), (_, indices) = _worker["shared"]
+    gain, feature, threshold = tree._evaluate_features(
+        X, y_codes, indices[start:end], class_counts, features, node_id
+    )
+    return gain, feature, threshold, tree.stats_
+
+
+def _build_subtree_task(start, end, histogram, depth, node_id):
+    # Sibling tasks and the parent work on disjoint slices of the indices
+    tree = _reset_worker_stats(_worker["tree"])
+    (_, X), (_, y_codes), (_, indices) = _worker["shared"]
+    tree._indices = indices
+    subtree = tree._build_tree(X, y_codes, start, end, histogram, depth, node_id)
+    return subtree, tree.stats_, end - start
 
-    def _traverse_tree_proba(self, x, tree):
-        if tree.get("leaf"):
-            return tree["class_distribution"]
-        else:
-            feature = tree["feature"]
-            threshold = tree["threshold"]
 
-            if x[feature] <= threshold:
-                return self._traverse_tree_proba(x, tree["left"])
+def _resolve_subtrees(tree, collect):
+    # Swap the futures left on the frontier for the subtrees they built;
+    # collect unpacks each task result into its subtree
+    if isinstance(tree, Future):
+        return collect(tree.result())
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node.get("leaf"):
+            continue
+        for side in ("left", "right"):
+            if isinstance(node[side], Future):
+                node[side] = collect(node[side].result())
             else:
-                return self._traverse_tree_proba(x, tree["right"])
+                stack.append(node[side])
+    return tree
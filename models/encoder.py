@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+
+class FeatureEncoder:
+    def __init__(self, columns, dtype=np.float32):
+        self.columns = list(columns)
+        self.dtype = dtype
+        # Numeric fields map by name, string values by their "<field>_<value>" dummy
+        self.offsets = {column: i for i, column in enumerate(self.columns)}
+
+    def encode(self, record, out=None):
+        if out is None:
+            out = np.zeros(len(self.columns), dtype=self.dtype)
+        else:
+            out[:] = 0
+
+        offsets = self.offsets
+        for field, value in record.items():
+            if isinstance(value, str):
+                # The dropped first category and unseen values have no column
+                offset = offsets.get(f"{field}_{value}")
+                if offset is not None:
+                    out[offset] = 1
+            else:
+                offset = offsets.get(field)
+                if offset is not None:
+                    out[offset] = value
+        return out
+
+    def encode_batch(self, records, out=None):
+        if out is None or len(out) < len(records):
+            out = np.zeros((len(records), len(self.columns)), dtype=self.dtype)
+        out = out[: len(records)]
+        for row, record in zip(out, records):
+            self.encode(record, out=row)
+        return out
+
+    def encode_frame(self, df, out=None):
+        # Column-at-a-time version of encode for scoring whole chunks
+        if out is None or len(out) < len(df):
+            out = np.zeros((len(df), len(self.columns)), dtype=self.dtype)
+        out = out[: len(df)]
+        out[:] = 0
+
+        offsets = self.offsets
+        rows = np.arange(len(df))
+        for field in df.columns:
+            values = df[field]
+            if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+                # One dict lookup per distinct value, then a scatter of ones
+                codes, uniques = pd.factorize(values)
+                lookup = np.array(
+                    [offsets.get(f"{field}_{value}", -1) for value in uniques] + [-1]
+                )
+                columns = lookup[codes]
+                hit = columns >= 0
+                out[rows[hit], columns[hit]] = 1
+            elif field in offsets:
+                out[:, offsets[field]] = values.to_numpy(
+                    dtype=np.float64, na_value=np.nan
+                )
+        return out
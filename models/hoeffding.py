@@ -0,0 +1,274 @@
+import argparse
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from models.decision_tree import DecisionTree
+from models.model_format import save_model
+from models.registry import registry
+from models.shared_memory import feature_array
+
+
+class HoeffdingTree(DecisionTree):
+    def __init__(
+        self,
+        max_depth=None,
+        max_bins=64,
+        grace_period=200,
+        split_confidence=1e-7,
+        tie_threshold=0.05,
+        min_samples_leaf=1,
+        max_leaf_nodes=None,
+        categorical_features=None,
+        chunk_size=10_000,
+        checkpoint_path=None,
+    ):
+        # Bin edges come from the first batch and stay fixed afterwards
+        super().__init__(
+            max_depth=max_depth,
+            max_bins=max_bins,
+            categorical_features=categorical_features,
+            min_samples_leaf=min_samples_leaf,
+            # Leaves hold one histogram each, so this bounds memory
+            max_leaf_nodes=max_leaf_nodes,
+        )
+        # Rows a leaf collects between two split attempts
+        self.grace_period = grace_period
+        # A leaf splits once the best feature beats the runner-up with
+        # probability 1 - split_confidence, or the two are within tie_threshold
+        self.split_confidence = split_confidence
+        self.tie_threshold = tie_threshold
+        # Rows routed to their leaves before the leaves try to split
+        self.chunk_size = chunk_size
+        # Written after every partial_fit call when set
+        self.checkpoint_path = checkpoint_path
+        self.stats_ = None
+        self.tree = None
+
+    def fit(self, X, y, classes=None):
+        self.tree = None
+        return self.partial_fit(X, y, classes)
+
+    def partial_fit(self, X, y, classes=None):
+        X = feature_array(X)
+        y = np.asarray(y)
+        if self.tree is None:
+            self._start(X, y, classes)
+
+        unknown = ~np.isin(y, self.classes_)
+        if unknown.any():
+            raise ValueError(
+                f"Classes {np.unique(y[unknown])} were not seen in the first batch, "
+                "pass every class with classes= on the first call"
+            )
+        y_codes = np.searchsorted(self.classes_, y)
+        X_binned = self._bin_features(X)
+
+        for start in range(0, len(X), self.chunk_size):
+            end = start + self.chunk_size
+            self._learn_chunk(X[start:end], X_binned[start:end], y_codes[start:end])
+        self.n_samples_seen_ += len(X)
+
+        if self.checkpoint_path is not None:
+            self.save_checkpoint(self.checkpoint_path)
+        return self
+
+    def save_checkpoint(self, path):
+        # Written next to the target and renamed, a crash keeps the old one
+        joblib.dump(self, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def _start(self, X, y, classes):
+        self.classes_ = np.unique(y if classes is None else classes)
+        self.num_classes_ = len(self.classes_)
+        self.n_features_in_ = X.shape[1]
+        self.n_samples_seen_ = 0
+        self.is_categorical_ = np.zeros(self.n_features_in_, dtype=bool)
+        if self.categorical_features is not None:
+            # Codes above the first batch's largest share its last bin
+            self.is_categorical_[self.categorical_features] = True
+
+        self.bin_edges_ = self._compute_bin_edges(X, np.arange(len(X)))
+        num_bins = [len(edges) + 1 for edges in self.bin_edges_]
+        self.bin_offsets_ = np.cumsum([0] + num_bins)
+        self.bin_features_ = np.repeat(np.arange(len(num_bins)), num_bins)
+
+        self.tree = self._new_leaf(np.zeros(self.num_classes_), depth=0)
+        self.num_leaves_ = 1
+        self._compiled = self._compile_tree(self.tree)
+
+    def _new_leaf(self, class_counts, depth):
+        # class_counts starts from the parent's split statistics, so a new
+        # leaf predicts sensibly before it has seen rows of its own
+        return {
+            **self._make_leaf(class_counts),
+            "class_counts": class_counts.astype(np.float64),
+            "histogram": np.zeros(
+                (self.bin_offsets_[-1], self.num_classes_), dtype=np.int64
+            ),
+            "pending": 0,
+            "depth": depth,
+        }
+
+    def _learn_chunk(self, X, X_binned, y_codes):
+        nodes = self._flatten_tree(self.tree)
+        positions = self.apply(X)
+        order = np.argsort(positions, kind="stable")
+        starts = np.flatnonzero(np.diff(positions[order], prepend=-1))
+        for rows in np.split(order, starts[1:]):
+            leaf = nodes[positions[rows[0]]]
+            leaf["histogram"] += self._calculate_histogram(X_binned, y_codes, rows)
+            leaf["class_counts"] += np.bincount(
+                y_codes[rows], minlength=self.num_classes_
+            )
+            leaf.update(self._make_leaf(leaf["class_counts"]))
+            leaf["pending"] += len(rows)
+            if leaf["pending"] >= self.grace_period:
+                leaf["pending"] = 0
+                self._try_split(leaf)
+
+        # Distributions changed in place, the compiled arrays need a refresh
+        self._compiled = self._compile_tree(self.tree)
+
+    def _try_split(self, leaf):
+        if leaf["depth"] == self.max_depth or (
+            self.max_leaf_nodes is not None and self.num_leaves_ >= self.max_leaf_nodes
+        ):
+            return
+
+        histogram = leaf["histogram"]
+        # Every feature sees every row, so the first feature's bins hold them all
+        class_counts = histogram[: self.bin_offsets_[1]].sum(axis=0)
+        num_samples = class_counts.sum()
+        if (
+            np.count_nonzero(class_counts) <= 1
+            or num_samples < 2 * self.min_samples_leaf
+        ):
+            return
+
+        order = None
+        if self.is_categorical_.any():
+            order = self._order_histogram_bins(histogram)
+            histogram = histogram[order]
+        is_last_bin = np.zeros(len(histogram), dtype=bool)
+        is_last_bin[self.bin_offsets_[1:] - 1] = True
+        candidates = np.flatnonzero(histogram.any(axis=1) & ~is_last_bin)
+        if len(candidates) == 0:
+            return
+
+        cumulative_counts = np.cumsum(histogram, axis=0)
+        feature_starts = np.vstack(
+            (np.zeros(self.num_classes_, dtype=np.int64), cumulative_counts)
+        )[self.bin_offsets_[:-1]]
+        features = self.bin_features_[candidates]
+        left_counts = cumulative_counts[candidates] - feature_starts[features]
+        right_counts = class_counts - left_counts
+        parent_entropy = self._calculate_entropies(class_counts[None, :])[0]
+        gains = self._calculate_gains(left_counts, right_counts, parent_entropy)
+
+        # Hoeffding bound on the gap between the two best features
+        best_index = np.argmax(gains)
+        best_gain = gains[best_index]
+        best_feature = features[best_index]
+        others = gains[features != best_feature]
+        second_gain = max(others.max(initial=0.0), 0.0)
+        value_range = np.log2(self.num_classes_)
+        epsilon = np.sqrt(
+            value_range**2 * np.log(1 / self.split_confidence) / (2 * num_samples)
+        )
+        if best_gain <= 0 or (
+            best_gain - second_gain <= epsilon and epsilon >= self.tie_threshold
+        ):
+            return
+
+        position = candidates[best_index]
+        start = self.bin_offsets_[best_feature]
+        if self.is_categorical_[best_feature]:
+            occupied = histogram[start : position + 1].any(axis=1)
+            split = np.sort(order[start : position + 1][occupied] - start)
+        else:
+            split = position - start
+
+        depth = leaf["depth"]
+        left = self._new_leaf(left_counts[best_index], depth + 1)
+        right = self._new_leaf(right_counts[best_index], depth + 1)
+        # The leaf turns into the split node, its histogram is released
+        class_counts = leaf["class_counts"]
+        leaf.clear()
+        leaf.update(self._make_split(best_feature, split, left, right, class_counts))
+        self.num_leaves_ += 1
+
+
+def load_checkpoint(path):
+    return joblib.load(path)
+
+
+def read_batches(path, batch_size):
+    # A CSV file, or a Parquet file or dataset such as utils.cleaning writes
+    if path.endswith(".csv"):
+        yield from pd.read_csv(path, chunksize=batch_size)
+        return
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    for batch in dataset.to_batches(batch_size=batch_size):
+        yield batch.to_pandas()
+
+
+def update_model(
+    data_path, checkpoint_path, batch_size=100_000, export_path=None, progress=None
+):
+    if os.path.exists(checkpoint_path):
+        tree = load_checkpoint(checkpoint_path)
+        tree.checkpoint_path = checkpoint_path
+    else:
+        tree = HoeffdingTree(checkpoint_path=checkpoint_path)
+
+    encoder = registry.encoder()
+    features = np.zeros((batch_size, len(encoder.columns)), dtype=encoder.dtype)
+    for batch in read_batches(data_path, batch_size):
+        y = batch.pop("Severity").to_numpy()
+        # Severity levels 1-4 are all declared up front, a month may miss one
+        tree.partial_fit(
+            encoder.encode_frame(batch, out=features), y, classes=[1, 2, 3, 4]
+        )
+        if progress is not None:
+            progress(tree.n_samples_seen_, tree.num_leaves_)
+
+    if export_path is not None:
+        save_model(tree, export_path)
+    return tree
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Update a streaming decision tree with a new batch of accidents"
+    )
+    parser.add_argument(
+        "data", help="cleaned accidents with Severity, as CSV or a Parquet dataset"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default="models/hoeffding_checkpoint.pkl",
+        help="learner state, created on the first run and updated in place",
+    )
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument(
+        "--export",
+        help="also write the tree in the binary model format, e.g. "
+        "models/decision_tree_model.model",
+    )
+    args = parser.parse_args(argv)
+
+    update_model(
+        args.data,
+        args.checkpoint,
+        batch_size=args.batch_size,
+        export_path=args.export,
+        progress=lambda rows, leaves: print(f"{rows} rows seen, {leaves} leaves"),
+    )
+
+
+if __name__ == "__main__":
+    main()
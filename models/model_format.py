@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import struct
+
+import joblib
+import numpy as np
+
+from models.decision_tree import DecisionTree
+from models.random_forest import RandomForest
+
+# File layout: MAGIC, format version and header length as little-endian
+# uint32, a JSON header, then every node array as raw bytes at an aligned offset
+MAGIC = b"PAMLTREE"
+FORMAT_VERSION = 1
+MODEL_SUFFIX = ".model"
+ALIGNMENT = 64
+
+NODE_ARRAYS = [
+    "feature",
+    "threshold",
+    "left",
+    "right",
+    "is_leaf",
+    "value",
+    "category_row",
+    "category_mask",
+]
+TREE_PARAMS = [
+    "max_depth",
+    "feature_sampling_factor",
+    "threshold_sampling_factor",
+    "max_bins",
+    "random_state",
+    "n_jobs",
+    "categorical_features",
+    "min_samples_split",
+    "min_samples_leaf",
+    "min_impurity_decrease",
+    "max_leaf_nodes",
+]
+FOREST_PARAMS = [
+    "n_estimators",
+    "max_depth",
+    "feature_sampling_factor",
+    "threshold_sampling_factor",
+    "max_bins",
+    "bootstrap",
+    "oob_score",
+    "random_state",
+    "n_jobs",
+    "categorical_features",
+    "min_samples_split",
+    "min_samples_leaf",
+    "min_impurity_decrease",
+    "max_leaf_nodes",
+]
+
+
+def binary_path(path):
+    return os.path.splitext(path)[0] + MODEL_SUFFIX
+
+
+def is_binary_model(path):
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def save_model(model, path):
+    if isinstance(model, DecisionTree):
+        header = {"model": "DecisionTree", "params": _params(model, TREE_PARAMS)}
+        trees = [model]
+    elif isinstance(model, RandomForest):
+        header = {
+            "model": "RandomForest",
+            "params": _params(model, FOREST_PARAMS),
+            "classes": _classes(model.classes_),
+            "n_features_in": model.n_features_in_,
+        }
+        if model.oob_score:
+            header["oob_score"] = float(model.oob_score_)
+        trees = model.trees_
+    else:
+        raise TypeError(f"Cannot save {type(model).__name__} in the binary format")
+
+    # Offsets are relative to the end of the header, which is padded to ALIGNMENT
+    arrays = []
+    offset = 0
+    header["trees"] = []
+    for tree in trees:
+        compiled = tree._get_compiled()
+        entries = {}
+        for name in NODE_ARRAYS:
+            array = np.ascontiguousarray(compiled[name])
+            entries[name] = [offset, array.dtype.str, list(array.shape)]
+            arrays.append((offset, array))
+            offset += _aligned(array.nbytes)
+        n_features_in = _n_features_in(tree, compiled)
+        # Trees pickled before categorical splits existed have no is_categorical_
+        is_categorical = getattr(tree, "is_categorical_", None)
+        if is_categorical is None:
+            is_categorical = np.zeros(n_features_in, dtype=bool)
+        header["trees"].append(
+            {
+                "classes": _classes(tree.classes_),
+                "n_features_in": n_features_in,
+                "is_categorical": is_categorical.tolist(),
+                "arrays": entries,
+            }
+        )
+
+    encoded = json.dumps(header).encode()
+    prefix = MAGIC + struct.pack("<II", FORMAT_VERSION, len(encoded))
+    data_start = _aligned(len(prefix) + len(encoded))
+
+    # Written next to the target and renamed, readers never see a partial file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(prefix + encoded)
+        for array_offset, array in arrays:
+            file.seek(data_start + array_offset)
+            file.write(array.tobytes())
+        file.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def load_model(path, mmap=True):
+    with open(path, "rb") as file:
+        prefix = file.read(len(MAGIC) + 8)
+        if prefix[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a binary model file")
+        version, header_length = struct.unpack("<II", prefix[len(MAGIC) :])
+        if version > FORMAT_VERSION:
+            raise ValueError(
+                f"{path} uses model format version {version}, "
+                f"this code reads up to {FORMAT_VERSION}"
+            )
+        header = json.loads(file.read(header_length))
+    data_start = _aligned(len(prefix) + header_length)
+
+    # One read-only mapping of the file, every node array is a view into it,
+    # so processes loading the same file share its pages
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+    else:
+        data = np.fromfile(path, dtype=np.uint8)
+    trees = [_load_tree(header, entry, data, data_start) for entry in header["trees"]]
+
+    if header["model"] == "DecisionTree":
+        return trees[0]
+    forest = RandomForest(**header["params"])
+    forest.classes_ = np.array(**header["classes"])
+    forest.num_classes_ = len(forest.classes_)
+    forest.n_features_in_ = header["n_features_in"]
+    forest.trees_ = trees
+    if "oob_score" in header:
+        forest.oob_score_ = header["oob_score"]
+    return forest
+
+
+def check_round_trip(model, path):
+    # The file must hold exactly the node arrays the pickled trees compile to
+    loaded = load_model(path, mmap=False)
+    trees = [model] if isinstance(model, DecisionTree) else model.trees_
+    loaded_trees = [loaded] if isinstance(loaded, DecisionTree) else loaded.trees_
+    if len(trees) != len(loaded_trees):
+        raise ValueError(
+            f"{path} holds {len(loaded_trees)} trees, expected {len(trees)}"
+        )
+    for tree, loaded_tree in zip(trees, loaded_trees):
+        compiled = tree._get_compiled()
+        for name in NODE_ARRAYS:
+            if not np.array_equal(
+                compiled[name], loaded_tree._compiled[name], equal_nan=True
+            ):
+                raise ValueError(f"{path} does not round-trip the {name} array")
+        if not np.array_equal(tree.classes_, loaded_tree.classes_):
+            raise ValueError(f"{path} does not round-trip the classes")
+
+
+def load_model_file(path):
+    # Binary model files are memory-mapped, anything else is a joblib pickle
+    if is_binary_model(path):
+        return load_model(path)
+    return joblib.load(path)
+
+
+def _load_tree(header, entry, data, data_start):
+    params = header["params"] if header["model"] == "DecisionTree" else {}
+    tree = DecisionTree(
+        **{name: params[name] for name in TREE_PARAMS if name in params}
+    )
+    tree.classes_ = np.array(**entry["classes"])
+    tree.num_classes_ = len(tree.classes_)
+    tree.n_features_in_ = entry["n_features_in"]
+    tree.is_categorical_ = np.array(entry["is_categorical"], dtype=bool)
+    tree.stats_ = None
+    # The nested dict form is not stored, prediction only needs the node arrays
+    tree.tree = None
+    tree._compiled = {}
+    for name, (offset, dtype, shape) in entry["arrays"].items():
+        dtype = np.dtype(dtype)
+        start = data_start + offset
+        nbytes = dtype.itemsize * int(np.prod(shape))
+        tree._compiled[name] = data[start : start + nbytes].view(dtype).reshape(shape)
+    return tree
+
+
+def _n_features_in(tree, compiled):
+    # Trees pickled before n_features_in_ existed only tell the features they
+    # split on; the highest one is the best lower bound
+    if hasattr(tree, "n_features_in_"):
+        return int(tree.n_features_in_)
+    return int(compiled["feature"].max(initial=-1)) + 1
+
+
+def _params(model, names):
+    # Models pickled before a parameter existed keep its default
+    return {
+        name: _jsonable(getattr(model, name)) for name in names if hasattr(model, name)
+    }
+
+
+def _classes(classes):
+    return {"object": classes.tolist(), "dtype": classes.dtype.str}
+
+
+def _jsonable(value):
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return value
+
+
+def _aligned(nbytes):
+    return -(-nbytes // ALIGNMENT) * ALIGNMENT
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert pickled DecisionTree and RandomForest models to the "
+        "memory-mapped binary format"
+    )
+    parser.add_argument("models", nargs="+", help="pickled model files")
+    args = parser.parse_args(argv)
+
+    for path in args.models:
+        output = binary_path(path)
+        model = joblib.load(path)
+        save_model(model, output)
+        check_round_trip(model, output)
+        print(f"{path} -> {output} ({os.path.getsize(output)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from models.decision_tree import DecisionTree
+from models.shared_memory import (
+    attach_array,
+    feature_array,
+    resolve_n_jobs,
+    shared_arrays,
+)
+
+
+class RandomForest:
+    def __init__(
+        self,
+        n_estimators=100,
+        max_depth=None,
+        feature_sampling_factor=None,
+        threshold_sampling_factor=1.0,
+        max_bins=None,
+        bootstrap=True,
+        oob_score=False,
+        random_state=None,
+        n_jobs=None,
+        categorical_features=None,
+        min_samples_split=2,
+        min_samples_leaf=1,
+        min_impurity_decrease=0.0,
+        max_leaf_nodes=None,
+    ):
+        self.n_estimators = n_estimators
+        self.max_depth = max_depth
+        # None samples sqrt(n_features) features per split
+        self.feature_sampling_factor = feature_sampling_factor
+        self.threshold_sampling_factor = threshold_sampling_factor
+        self.max_bins = max_bins
+        self.bootstrap = bootstrap
+        self.oob_score = oob_score
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+        self.categorical_features = categorical_features
+        self.min_samples_split = min_samples_split
+        self.min_samples_leaf = min_samples_leaf
+        self.min_impurity_decrease = min_impurity_decrease
+        self.max_leaf_nodes = max_leaf_nodes
+
+    def fit(self, X, y):
+        if self.oob_score and not self.bootstrap:
+            raise ValueError("Out-of-bag scoring requires bootstrap=True")
+
+        X = feature_array(X)
+        y = np.asarray(y)
+
+        self.classes_ = np.unique(y)
+        self.num_classes_ = len(self.classes_)
+        self.n_features_in_ = X.shape[1]
+
+        seed = self.random_state
+        if seed is None:
+            seed = np.random.randint(np.iinfo(np.int32).max)
+        tasks = [(seed, i) for i in range(self.n_estimators)]
+
+        n_jobs = min(resolve_n_jobs(self.n_jobs), self.n_estimators)
+        if n_jobs > 1:
+            # Every worker reads the same shared copy of X
+            with shared_arrays(X, y) as specs, ProcessPoolExecutor(
+                n_jobs, initializer=_init_worker, initargs=(self, specs)
+            ) as pool:
+                results = list(pool.map(_fit_tree_task, tasks))
+        else:
+            results = [self._fit_tree(X, y, *task) for task in tasks]
+
+        self.trees_ = [tree for tree, _, _ in results]
+        if self.oob_score:
+            self._set_oob_score(y, results)
+        return self
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def predict_proba(self, X):
+        X = feature_array(X)
+
+        proba = np.zeros((len(X), self.num_classes_))
+        for tree in self.trees_:
+            proba[:, self._tree_classes(tree)] += tree.predict_proba(X)
+        return proba / len(self.trees_)
+
+    def _tree_classes(self, tree):
+        # A bootstrap sample can miss a class, so map the tree's own columns
+        return np.searchsorted(self.classes_, tree.classes_)
+
+    def _fit_tree(self, X, y, seed, tree_index):
+        rng = np.random.default_rng([seed, tree_index])
+        num_samples = len(y)
+        if self.bootstrap:
+            rows = rng.integers(0, num_samples, num_samples)
+        else:
+            rows = np.arange(num_samples)
+
+        feature_sampling_factor = self.feature_sampling_factor
+        if feature_sampling_factor is None:
+            feature_sampling_factor = 1 / np.sqrt(self.n_features_in_)
+
+        tree = DecisionTree(
+            max_depth=self.max_depth,
+            feature_sampling_factor=feature_sampling_factor,
+            threshold_sampling_factor=self.threshold_sampling_factor,
+            max_bins=self.max_bins,
+            random_state=int(rng.integers(np.iinfo(np.int32).max)),
+            categorical_features=self.categorical_features,
+            min_samples_split=self.min_samples_split,
+            min_samples_leaf=self.min_samples_leaf,
+            min_impurity_decrease=self.min_impurity_decrease,
+            max_leaf_nodes=self.max_leaf_nodes,
+        )
+        # The tree trains on the bootstrap rows in place, X is never copied
+        tree.fit(X, y, sample_indices=rows)
+
+        if not self.oob_score:
+            return tree, None, None
+        oob_rows = np.flatnonzero(np.bincount(rows, minlength=num_samples) == 0)
+        oob_proba = np.concatenate(
+            [
+                tree.predict_proba(X[chunk])
+                for chunk in np.array_split(oob_rows, max(1, len(oob_rows) // 65536))
+            ]
+        )
+        return tree, oob_rows, oob_proba
+
+    def _set_oob_score(self, y, results):
+        oob_proba = np.zeros((len(y), self.num_classes_))
+        oob_counts = np.zeros(len(y), dtype=np.int64)
+        for tree, oob_rows, proba in results:
+            oob_proba[np.ix_(oob_rows, self._tree_classes(tree))] += proba
+            oob_counts[oob_rows] += 1
+
+        # Rows drawn into every bootstrap sample have no out-of-bag vote
+        scored = oob_counts > 0
+        self.oob_decision_function_ = np.full_like(oob_proba, np.nan)
+        self.oob_decision_function_[scored] = (
+            oob_proba[scored] / oob_counts[scored, None]
+        )
+        oob_prediction = self.classes_[np.argmax(oob_proba[scored], axis=1)]
+        self.oob_score_ = np.mean(oob_prediction == y[scored])
+
+
+# Worker-side state for parallel fits: the forest settings and the shared arrays
+_worker = {}
+
+
+def _init_worker(forest, specs):
+    _worker["forest"] = forest
+    _worker["shared"] = [attach_array(spec) for spec in specs]
+
+
+def _fit_tree_task(task):
+    (_, X), (_, y) = _worker["shared"]
+    return _worker["forest"]._fit_tree(X, y, *task)
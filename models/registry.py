@@ -0,0 +1,174 @@
+import json
+import mmap
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+
+from models.encoder import FeatureEncoder
+from models.model_format import binary_path, load_model_file
+
+MODEL_PATHS = {
+    "Decision Trees": "models/decision_tree_model.pkl",
+    "Random Forest": "models/random_forest_model.pkl",
+    "Naive Bayes": "models/naive_bayes_model.pkl",
+}
+MODEL_COLUMNS_PATH = "models/model_columns.json"
+LEGACY_MODEL_COLUMNS_PATH = "models/model_columns.pkl"
+
+
+def save_model_columns(columns, path=MODEL_COLUMNS_PATH):
+    with open(path, "w") as file:
+        json.dump([str(column) for column in columns], file)
+
+
+def load_model_columns(path=MODEL_COLUMNS_PATH, legacy_path=LEGACY_MODEL_COLUMNS_PATH):
+    if not os.path.exists(path) and os.path.exists(legacy_path):
+        # The old artifact is the whole training frame, keep only its columns
+        save_model_columns(joblib.load(legacy_path).columns, path)
+    with open(path) as file:
+        return json.load(file)
+
+
+class ModelRegistry:
+    def __init__(self, model_paths=MODEL_PATHS, max_models=3):
+        self.model_paths = model_paths
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._columns = None
+        self._encoder = None
+        self._stats = {
+            name: {"loads": 0, "hits": 0, "evictions": 0} for name in model_paths
+        }
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        if name not in self.model_paths:
+            return None
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                self._stats[name]["hits"] += 1
+                return self._models[name]
+
+            model = self._load(name)
+            self._models[name] = model
+            while len(self._models) > self.max_models:
+                evicted, _ = self._models.popitem(last=False)
+                self._stats[evicted]["evictions"] += 1
+            return model
+
+    def peek(self, name):
+        # A loaded model or None, without loading, counting a hit or
+        # refreshing its place in the LRU order
+        with self._lock:
+            return self._models.get(name)
+
+    def model_columns(self):
+        with self._lock:
+            if self._columns is None:
+                self._columns = load_model_columns()
+            return self._columns
+
+    def encoder(self):
+        if self._encoder is None:
+            self._encoder = FeatureEncoder(self.model_columns())
+        return self._encoder
+
+    def warmup(self, names=None):
+        # Missing artifacts are skipped, they fail on first use instead
+        for name in names if names is not None else self.model_paths:
+            if os.path.exists(self.model_file(name)):
+                self.get(name)
+        if os.path.exists(MODEL_COLUMNS_PATH) or os.path.exists(
+            LEGACY_MODEL_COLUMNS_PATH
+        ):
+            self.encoder()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                name: {**stats, "loaded": name in self._models}
+                for name, stats in self._stats.items()
+            }
+
+    def model_file(self, name):
+        # A binary model next to the pickle wins, the pickle is the fallback
+        path = self.model_paths[name]
+        if os.path.exists(binary_path(path)):
+            return binary_path(path)
+        return path
+
+    def _load(self, name):
+        start = time.perf_counter()
+        path = self.model_file(name)
+        model = load_model_file(path)
+        load_seconds = time.perf_counter() - start
+
+        stats = self._stats[name]
+        stats["loads"] += 1
+        stats["load_seconds"] = load_seconds
+        stats["memory_bytes"] = model_nbytes(model)
+        stats["file"] = path
+        return model
+
+
+ATOMIC_TYPES = (str, bytes, int, float, complex, bool, type(None), type, np.generic)
+
+
+def model_nbytes(model):
+    # Bytes the model itself holds: NumPy buffers plus the Python containers
+    # around them. Counted from the object graph, so work running in other
+    # threads is not included; memory-mapped node arrays live in the page
+    # cache and are not counted
+    seen = set()
+    # Pickling state is built on demand; it is kept alive so ids stay unique
+    reduced = []
+    total = 0
+    stack = [model]
+    while stack:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        if isinstance(value, np.ndarray):
+            # Views count the buffer they point into, once
+            buffer = value
+            while isinstance(buffer.base, np.ndarray):
+                buffer = buffer.base
+            if isinstance(buffer, np.memmap) or isinstance(buffer.base, mmap.mmap):
+                continue
+            if buffer is not value and id(buffer) in seen:
+                continue
+            seen.add(id(buffer))
+            total += buffer.nbytes
+            if buffer.dtype == object:
+                stack.extend(buffer.ravel().tolist())
+            continue
+        total += sys.getsizeof(value)
+        if isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            stack.extend(value)
+        elif hasattr(value, "__dict__"):
+            stack.append(value.__dict__)
+        elif not isinstance(value, ATOMIC_TYPES):
+            # Extension types such as sklearn's Cython Tree keep their arrays
+            # outside __dict__, but hand them over as pickling state
+            try:
+                state = value.__reduce_ex__(4)
+            except Exception:
+                continue
+            if isinstance(state, tuple):
+                reduced.append(state)
+                stack.extend(state[1:3])
+    return total
+
+
+# One registry per process, shared by every session
+registry = ModelRegistry()
@@ -0,0 +1,160 @@
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from models.decision_tree import DecisionTree
+from models.shared_memory import (
+    attach_array,
+    feature_array,
+    resolve_n_jobs,
+    shared_arrays,
+)
+
+DEFAULT_GRID = {
+    "max_depth": [4, 6, 8, 10, 12, 16],
+    "feature_sampling_factor": [0.5, 1.0],
+    "threshold_sampling_factor": [0.5, 1.0],
+}
+
+
+def search_tree_params(
+    X,
+    y,
+    param_grid=None,
+    cv=5,
+    max_bins=64,
+    categorical_features=None,
+    random_state=0,
+    n_jobs=None,
+    progress=None,
+):
+    param_grid = {**DEFAULT_GRID, **(param_grid or {})}
+    X = feature_array(X)
+    y = np.asarray(y)
+
+    # Binned once, every fold trains on row subsets of the same matrix;
+    # without max_bins the folds split exactly on the raw values
+    if max_bins is None:
+        X_binned, bin_edges = X, None
+    else:
+        X_binned, bin_edges = DecisionTree(
+            max_bins=max_bins, categorical_features=categorical_features
+        ).bin(X)
+    permutation = np.random.default_rng(random_state).permutation(len(y))
+    fold_bounds = np.linspace(0, len(y), cv + 1).astype(int)
+
+    # One tree per fold and sampling setting is fitted at the deepest
+    # max_depth, shallower depths are scored on truncated copies of it
+    depths = param_grid["max_depth"]
+    deepest = None if None in depths else max(depths)
+    settings = {
+        "depths": depths,
+        "deepest": deepest,
+        "max_bins": max_bins,
+        "bin_edges": bin_edges,
+        "categorical_features": categorical_features,
+        "random_state": random_state,
+    }
+    tasks = [
+        (fold_bounds[fold], fold_bounds[fold + 1], feature_factor, threshold_factor)
+        for fold in range(cv)
+        for feature_factor, threshold_factor in itertools.product(
+            param_grid["feature_sampling_factor"],
+            param_grid["threshold_sampling_factor"],
+        )
+    ]
+
+    rows = []
+    n_jobs = min(resolve_n_jobs(n_jobs), len(tasks))
+    if n_jobs > 1:
+        # Every worker reads the same shared copy of the data
+        with shared_arrays(X, X_binned, y, permutation) as specs, ProcessPoolExecutor(
+            n_jobs, initializer=_init_worker, initargs=(settings, specs)
+        ) as pool:
+            futures = [pool.submit(_score_task, task) for task in tasks]
+            for done, future in enumerate(as_completed(futures), 1):
+                rows.extend(future.result())
+                if progress is not None:
+                    progress(done, len(tasks))
+    else:
+        arrays = (X, X_binned, y, permutation)
+        for done, task in enumerate(tasks, 1):
+            rows.extend(_score_fold(arrays, settings, *task))
+            if progress is not None:
+                progress(done, len(tasks))
+
+    return summarize(pd.DataFrame(rows))
+
+
+def summarize(folds):
+    # One row per configuration, best mean accuracy first
+    columns = ["max_depth", "feature_sampling_factor", "threshold_sampling_factor"]
+    summary = (
+        folds.groupby(columns, dropna=False)
+        .agg(
+            mean_accuracy=("accuracy", "mean"),
+            std_accuracy=("accuracy", "std"),
+            fit_seconds=("fit_seconds", "mean"),
+            predict_seconds=("predict_seconds", "mean"),
+            trained_depth=("trained_depth", "first"),
+        )
+        .reset_index()
+    )
+    return summary.sort_values("mean_accuracy", ascending=False, ignore_index=True)
+
+
+def _score_fold(arrays, settings, start, stop, feature_factor, threshold_factor):
+    X, X_binned, y, permutation = arrays
+    test_rows = np.sort(permutation[start:stop])
+    train_rows = np.sort(np.concatenate((permutation[:start], permutation[stop:])))
+
+    tree = DecisionTree(
+        max_depth=settings["deepest"],
+        feature_sampling_factor=feature_factor,
+        threshold_sampling_factor=threshold_factor,
+        max_bins=settings["max_bins"],
+        random_state=settings["random_state"],
+        categorical_features=settings["categorical_features"],
+    )
+    fit_start = time.perf_counter()
+    tree.fit(X_binned, y, sample_indices=train_rows, bin_edges=settings["bin_edges"])
+    fit_seconds = time.perf_counter() - fit_start
+
+    # Thresholds are raw feature values, so scoring reads the unbinned rows
+    X_test, y_test = X[test_rows], y[test_rows]
+    rows = []
+    for depth in settings["depths"]:
+        model = tree if depth == settings["deepest"] else tree.truncate(depth)
+        predict_start = time.perf_counter()
+        prediction = model.predict(X_test)
+        rows.append(
+            {
+                "max_depth": depth,
+                "feature_sampling_factor": feature_factor,
+                "threshold_sampling_factor": threshold_factor,
+                "fold_start": start,
+                "accuracy": np.mean(prediction == y_test),
+                # Truncated depths report the fit of the tree they come from
+                "fit_seconds": fit_seconds,
+                "predict_seconds": time.perf_counter() - predict_start,
+                "trained_depth": settings["deepest"],
+            }
+        )
+    return rows
+
+
+# Worker-side state for parallel searches: the settings and the shared arrays
+_worker = {}
+
+
+def _init_worker(settings, specs):
+    _worker["settings"] = settings
+    _worker["shared"] = [attach_array(spec) for spec in specs]
+
+
+def _score_task(task):
+    arrays = [array for _, array in _worker["shared"]]
+    return _score_fold(arrays, _worker["settings"], *task)
@@ -0,0 +1,258 @@
+import argparse
+import asyncio
+import json
+import time
+import urllib.request
+from collections import deque
+
+import numpy as np
+
+from models.registry import MODEL_PATHS, registry
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    500: "Internal Server Error",
+}
+
+
+def validate_features(features):
+    # Checked before queueing, a malformed record never reaches a batch
+    if not isinstance(features, dict):
+        raise TypeError(f"features must be an object, got {type(features).__name__}")
+    for field, value in features.items():
+        if not isinstance(value, (str, int, float, bool)):
+            raise TypeError(
+                f"feature {field!r} must be a string, number or boolean, "
+                f"got {type(value).__name__}"
+            )
+    return features
+
+
+class ServiceMetrics:
+    def __init__(self, window=10_000):
+        # Latencies of the most recent requests, with their finish times
+        self._recent = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_rows = 0
+
+    def record_request(self, seconds, ok=True):
+        self.requests += 1
+        self.errors += not ok
+        self._recent.append((time.perf_counter(), seconds))
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.batched_rows += size
+
+    def snapshot(self):
+        now = time.perf_counter()
+        snapshot = {
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": (
+                self.batched_rows / self.batches if self.batches else 0.0
+            ),
+            "uptime_seconds": now - self.started,
+        }
+        if self._recent:
+            finished, latencies = np.array(self._recent).T
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            span = now - finished[0]
+            snapshot.update(
+                p50_ms=p50,
+                p99_ms=p99,
+                throughput_rps=len(latencies) / span if span > 0 else 0.0,
+            )
+        return snapshot
+
+
+class MicroBatcher:
+    def __init__(self, model_name, metrics, max_batch_size=64, max_wait=0.005):
+        self.model_name = model_name
+        self.metrics = metrics
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    async def submit(self, record):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((record, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # The first request opens a window, later ones join until it closes
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            records = [record for record, _ in batch]
+            try:
+                results = await loop.run_in_executor(None, self._score, records)
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.metrics.record_batch(len(batch))
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _score(self, records):
+        # Records are encoded one at a time, so a record that fails to encode
+        # only fails its own request; the rest are scored together
+        model = registry.get(self.model_name)
+        encoder = registry.encoder()
+        # float64 like batch_score: a float32 copy of an input such as 29.92
+        # can land on the other side of an exact-mode threshold
+        features = np.zeros((len(records), len(encoder.columns)), dtype=np.float64)
+        results = [None] * len(records)
+        encoded = []
+        for i, record in enumerate(records):
+            try:
+                encoder.encode(record, out=features[i])
+            except Exception as error:
+                results[i] = error
+            else:
+                encoded.append(i)
+        if not encoded:
+            return results
+
+        proba = model.predict_proba(features[encoded])
+        classes = [value.item() for value in model.classes_]
+        for i, row in zip(encoded, proba):
+            results[i] = {
+                "model": self.model_name,
+                "severity": classes[np.argmax(row)],
+                "probabilities": dict(zip(map(str, classes), row.tolist())),
+            }
+        return results
+
+
+class PredictionService:
+    def __init__(self, max_batch_size=64, max_wait=0.005):
+        self.metrics = ServiceMetrics()
+        self.batchers = {
+            name: MicroBatcher(name, self.metrics, max_batch_size, max_wait)
+            for name in MODEL_PATHS
+        }
+
+    async def handle(self, method, path, body):
+        if method == "GET" and path == "/metrics":
+            return 200, self.metrics.snapshot()
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok"}
+        if method != "POST" or path != "/predict":
+            return 404, {"error": f"No route for {method} {path}"}
+
+        try:
+            request = json.loads(body)
+            batcher = self.batchers[request["model"]]
+            features = validate_features(request["features"])
+        except (ValueError, KeyError, TypeError) as error:
+            return 400, {"error": f"Invalid request: {error!r}"}
+        return 200, await batcher.submit(features)
+
+    async def serve_connection(self, reader, writer):
+        try:
+            # Connections are kept alive until the client closes them
+            while request_line := await reader.readline():
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                start = time.perf_counter()
+                try:
+                    status, payload = await self.handle(method, path, body)
+                except Exception as error:
+                    status, payload = 500, {"error": repr(error)}
+                if path == "/predict":
+                    self.metrics.record_request(
+                        time.perf_counter() - start, ok=status == 200
+                    )
+
+                content = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(content)}\r\n\r\n".encode("latin-1")
+                    + content
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host="127.0.0.1", port=8502, max_batch_size=64, max_wait=0.005):
+    service = PredictionService(max_batch_size, max_wait)
+    server = await asyncio.start_server(service.serve_connection, host, port)
+    # Requests that arrive during warmup wait on the registry instead of failing
+    warmup = asyncio.get_running_loop().run_in_executor(None, registry.warmup)
+    async with server:
+        await warmup
+        await server.serve_forever()
+
+
+def predict_remote(url, model_name, features, timeout=10):
+    # Blocking client used by the Streamlit page
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/predict",
+        data=json.dumps(
+            {"model": model_name, "features": features},
+            default=lambda value: value.item(),
+        ).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve severity predictions over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=5.0,
+        help="how long a batch waits for more requests after the first one",
+    )
+    args = parser.parse_args(argv)
+    asyncio.run(
+        serve(args.host, args.port, args.max_batch_size, args.max_wait_ms / 1000)
+    )
+
+
+if __name__ == "__main__":
+    main()
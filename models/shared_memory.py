@@ -0,0 +1,77 @@
+import mmap
+import os
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def feature_array(X):
+    # Mixed bool/numeric frames arrive as object arrays. asanyarray keeps an
+    # np.memmap a memmap, so workers can still share it through the page cache
+    X = np.asanyarray(X)
+    if X.dtype == object:
+        X = X.astype(np.float64)
+    return X
+
+
+def share_array(array):
+    # A file-backed memmap is already shared through the page cache
+    if (
+        isinstance(array, np.memmap)
+        and isinstance(array.base, mmap.mmap)
+        and array.flags.c_contiguous
+    ):
+        return None, (
+            "memmap",
+            array.filename,
+            array.offset,
+            array.shape,
+            array.dtype.str,
+        )
+
+    # Anything else is copied once into a named block that workers attach to
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    shared[...] = array
+    return shm, ("shm", shm.name, array.shape, array.dtype.str)
+
+
+def attach_array(spec, writeable=False):
+    if spec[0] == "memmap":
+        _, filename, offset, shape, dtype = spec
+        array = np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=shape)
+        return None, array
+
+    _, name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    # Read-only unless the caller owns disjoint slices it writes to
+    array.flags.writeable = writeable
+    return shm, array
+
+
+@contextmanager
+def shared_arrays(*arrays):
+    blocks = []
+    try:
+        specs = []
+        for array in arrays:
+            shm, spec = share_array(array)
+            if shm is not None:
+                blocks.append(shm)
+            specs.append(spec)
+        yield specs
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+def resolve_n_jobs(n_jobs):
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return max(1, n_jobs)
@@ -0,0 +1,96 @@
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+PHASES = ["binning", "histogram", "split_search", "entropy_gain", "partition"]
+
+
+def depth_of(node_id):
+    # Nodes are numbered heap style: the children of n are 2n + 1 and 2n + 2
+    return (node_id + 1).bit_length() - 1
+
+
+class TreeStats:
+    def __init__(self, window=1000):
+        self.splits = defaultdict(int)
+        self.leaves = defaultdict(int)
+        self.thresholds = defaultdict(int)
+        # Seconds per phase; split_search includes entropy_gain, and work done
+        # in worker processes is summed, so phases can exceed the fit time
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.bytes_copied = 0
+        self.fit_seconds = 0.0
+        # Rows and seconds of the most recent inference calls
+        self.inference = deque(maxlen=window)
+
+    @contextmanager
+    def timer(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[phase] += time.perf_counter() - start
+
+    def record_node(self, depth, leaf):
+        if leaf:
+            self.leaves[depth] += 1
+        else:
+            self.splits[depth] += 1
+
+    def record_thresholds(self, node_id, count):
+        self.thresholds[depth_of(node_id)] += count
+
+    def record_copy(self, nbytes):
+        self.bytes_copied += nbytes
+
+    def record_inference(self, rows, seconds):
+        self.inference.append((rows, seconds))
+
+    def merge(self, other):
+        for mine, theirs in [
+            (self.splits, other.splits),
+            (self.leaves, other.leaves),
+            (self.thresholds, other.thresholds),
+            (self.seconds, other.seconds),
+        ]:
+            for key, value in theirs.items():
+                mine[key] += value
+        self.bytes_copied += other.bytes_copied
+        return self
+
+    def by_depth(self):
+        depths = sorted(set(self.splits) | set(self.leaves) | set(self.thresholds))
+        return [
+            {
+                "depth": depth,
+                "splits": self.splits[depth],
+                "leaves": self.leaves[depth],
+                "thresholds_evaluated": self.thresholds[depth],
+            }
+            for depth in depths
+        ]
+
+    def snapshot(self):
+        snapshot = {
+            "nodes": sum(self.splits.values()) + sum(self.leaves.values()),
+            "leaves": sum(self.leaves.values()),
+            "max_depth": max(self.leaves, default=0),
+            "thresholds_evaluated": sum(self.thresholds.values()),
+            "bytes_copied": self.bytes_copied,
+            "fit_seconds": self.fit_seconds,
+            **{f"{phase}_seconds": self.seconds[phase] for phase in PHASES},
+            "inference_calls": len(self.inference),
+        }
+        if self.inference:
+            rows, seconds = np.array(self.inference).T
+            p50, p99 = np.percentile(seconds, [50, 99]) * 1000
+            snapshot.update(
+                inference_p50_ms=p50,
+                inference_p99_ms=p99,
+                inference_rows_per_second=(
+                    rows.sum() / seconds.sum() if seconds.sum() > 0 else 0.0
+                ),
+            )
+        return snapshot
@@ -1,23 +1,17 @@
 import streamlit as st
-import matplotlib.pyplot as plt
 import plotly.express as px
 import seaborn as sns
 from st_pages import add_page_title
 
-add_page_title()
-
-if "df" not in st.session_state:
-    st.markdown("⚠️ Data not loaded. Please go to the [Home page](/) to load the data.")
-    st.stop()
+from utils.dataset import get_density_map, get_spatial_index, get_summaries
 
+add_page_title()
 
-df = st.session_state["df"]
-df["Severity4"] = 0
-df.loc[df["Severity"] == 4, "Severity4"] = 1
-severity4 = df[df["Severity4"] == 1]
+with st.spinner("Loading data..."):
+    summaries = get_summaries()
 
 st.markdown("## Accidents Over Time")
-accidents_by_year = df["Year"].value_counts().sort_index()
+accidents_by_year = summaries["year_counts"]
 fig = px.line(
     x=accidents_by_year.index,
     y=accidents_by_year.values,
@@ -27,16 +21,16 @@ st.plotly_chart(fig, use_container_width=True)
 
 
 st.markdown("## Accidents by the Time of Day")
-df["Hour"] = df["Start_Time"].dt.hour
+hour_counts = summaries["hour_counts"]
 fig = px.bar(
-    x=df["Hour"].value_counts().index,
-    y=df["Hour"].value_counts().values,
+    x=hour_counts.index,
+    y=hour_counts.values,
     labels={"x": "Hour", "y": "Number of Accidents"},
 )
 st.plotly_chart(fig, use_container_width=True)
 
 st.write("### Top 10 Weather Condition for Accidents")
-weather_count = df["Weather_Condition"].value_counts().head(10)
+weather_count = summaries["weather_counts"]
 fig = px.bar(
     x=weather_count.index,
     y=weather_count.values,
@@ -46,7 +40,7 @@ st.plotly_chart(fig, use_container_width=True)
 
 
 st.markdown("## Accidents by State")
-accident_counts = df["State"].value_counts().reset_index()
+accident_counts = summaries["state_counts"].reset_index()
 accident_counts.columns = ["state", "counts"]
 fig = px.choropleth(
     accident_counts,
@@ -59,31 +53,27 @@ fig = px.choropleth(
 st.plotly_chart(fig, use_container_width=True)
 
 st.markdown("## Map of Accidents with Severity Level 4")
-plt.figure(figsize=(15, 10))
-plt.plot(
-    "Start_Lng",
-    "Start_Lat",
-    data=df,
-    linestyle="",
-    marker="o",
-    markersize=1.5,
-    color="teal",
-    alpha=0.2,
-    label="All Accidents",
+zoom = st.select_slider("Map detail", options=[0, 1, 2, 3], value=1)
+# Binned into a density image once per dataset version and zoom, then reused
+st.image(get_density_map(zoom), use_column_width=True)
+
+st.markdown("## Accidents Near a Location")
+spatial_index = get_spatial_index()
+col1, col2, col3 = st.columns(3)
+with col1:
+    lat = st.number_input("Latitude", -90.0, 90.0, 40.7128, format="%.4f")
+with col2:
+    lng = st.number_input("Longitude", -180.0, 180.0, -74.0060, format="%.4f")
+with col3:
+    miles = st.slider("Radius (mi)", 1, 100, 10)
+nearby = spatial_index.radius_stats(lat, lng, miles)
+st.markdown(
+    f"#### {nearby['accidents']} accidents within {miles} miles - Average Severity: {nearby['mean_severity']:.2f}"
 )
-plt.plot(
-    "Start_Lng",
-    "Start_Lat",
-    data=severity4,
-    linestyle="",
-    marker="o",
-    markersize=1.5,
-    color="red",
-    alpha=0.5,
-    label="Accidents with Serverity Level 4",
+st.write("Closest recorded accidents:")
+st.dataframe(
+    spatial_index.nearest_frame(lat, lng, 10)[
+        ["Start_Time", "City", "State", "Severity", "Distance_From_Point(mi)"]
+    ],
+    hide_index=True,
 )
-plt.legend(markerscale=8)
-plt.xlabel("Longitude", size=12, labelpad=3)
-plt.ylabel("Latitude", size=12, labelpad=3)
-
-st.pyplot(plt)
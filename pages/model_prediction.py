@@ -1,18 +1,27 @@
 import streamlit as st
 from st_pages import add_page_title
-import joblib
 import numpy as np
 import pandas as pd
 import json
+import os
+
+from models.registry import registry
+from models.service import predict_remote
+from utils.dataset import DATA_PATH, get_spatial_index, is_loaded
 
 add_page_title()
 
-if "df" not in st.session_state:
-    st.markdown("⚠️ Data not loaded. Please go to the [Home page](/) to load the data.")
-    st.stop()("⚠️ Data not loaded. Please go to the Home page to load the data.")
+# When set, predictions go to the batching HTTP service from models/service.py
+service_url = os.environ.get("PREDICTION_SERVICE_URL")
+
+
+@st.cache_resource
+def load_locations():
+    with open("data/state_city_county.json", "r") as json_file:
+        return json.load(json_file)
+
 
-with open("data/state_city_county.json", "r") as json_file:
-    loc_data = json.load(json_file)
+loc_data = load_locations()
 
 st.markdown(
     "This section allows you to predict accident severity by selecting a model and entering relevant data."
@@ -111,6 +120,28 @@ if state:
         with col3:
             county = st.selectbox("County", counties, key="county")
 
+with st.expander("Historical accidents near this location"):
+    # Expander bodies run even when collapsed, so the dataset and its index
+    # are only loaded once asked for; predicting never needs them
+    show_nearby = st.checkbox("Look up accidents near this location", key="nearby")
+    place = None
+    if show_nearby and not (is_loaded() or os.path.exists(DATA_PATH)):
+        st.info(f"The accident dataset ({DATA_PATH}) is not available.")
+    elif show_nearby:
+        with st.spinner("Indexing accident locations..."):
+            spatial_index = get_spatial_index()
+        place = spatial_index.place(state, city)
+        if place is None:
+            st.write(f"No recorded accidents in {city}, {state}.")
+    if place is not None:
+        miles = st.slider("Radius (mi)", 1, 50, 10, key="radius")
+        nearby = spatial_index.radius_stats(*place, miles)
+        st.write(
+            f"{nearby['accidents']} accidents within {miles} miles of {city}, {state}"
+            f" - Average Severity: {nearby['mean_severity']:.2f}"
+        )
+        st.bar_chart(pd.Series(nearby["severity_counts"], name="Accidents"))
+
 # Time
 st.markdown("### Select Time")
 col1, col2, col3 = st.columns(3)
@@ -203,7 +234,6 @@ route_features = st.multiselect(
 )
 
 predict_button = st.button("Predict Severity")
-model_columns = joblib.load("models/model_columns.pkl")
 
 
 def has_route_feature(feature):
@@ -214,86 +244,85 @@ def is_weather(w):
     return weather == w
 
 
-def preprocess_input_data(new_data):
-    new_data_df = pd.DataFrame(new_data)
-    new_data_dummy = pd.get_dummies(new_data_df, drop_first=True)
-    aligned_data = new_data_dummy.reindex(columns=model_columns.columns, fill_value=0)
-    return aligned_data
-
-
 def choose_model(model_choice):
-    if model_choice == "Decision Trees":
-        dt_model = joblib.load("models/decision_tree_model.pkl")
-        return dt_model
-    elif model_choice == "Random Forest":
-        rf_model = joblib.load("models/random_forest_model.pkl")
-        return rf_model
-    elif model_choice == "Naive Bayes":
-        nb_model = joblib.load("models/naive_bayes_model.pkl")
-        return nb_model
+    # Loaded once per process, later clicks are served from memory
+    return registry.get(model_choice)
 
 
 if predict_button:
     with st.spinner("Predicting Severity..."):
-        model = choose_model(model_choice)
-        if model is None:
-            st.error("Model not implemented yet.")
-            st.stop()
-
         time_of_day = "Day" if 6 <= hour < 18 else "Night"
-        features = [
-            {
-                "City": city,
-                "County": county,
-                "State": state,
-                "Temperature(F)": temperature,
-                "Humidity(%)": humidity,
-                "Pressure(in)": pressure,
-                "Visibility(mi)": visibility,
-                "Wind_Direction": wind_direction,
-                "Wind_Speed(mph)": wind_speed,
-                "Precipitation(in)": precipitation,
-                "Amenity": has_route_feature("Amenity"),
-                "Bump": has_route_feature("Bump"),
-                "Crossing": has_route_feature("Crossing"),
-                "Give_Way": has_route_feature("Give_Way"),
-                "Junction": has_route_feature("Junction"),
-                "No_Exit": has_route_feature("No_Exit"),
-                "Railway": has_route_feature("Railway"),
-                "Roundabout": has_route_feature("Roundabout"),
-                "Station": has_route_feature("Station"),
-                "Stop": has_route_feature("Stop"),
-                "Traffic_Calming": has_route_feature("Traffic_Calming"),
-                "Traffic_Signal": has_route_feature("Traffic_Signal"),
-                "Sunrise_Sunset": time_of_day,
-                "Civil_Twilight": time_of_day,
-                "Nautical_Twilight": time_of_day,
-                "Astronomical_Twilight": time_of_day,
-                "Clear": is_weather("Clear"),
-                "Cloud": is_weather("Cloud"),
-                "Rain": is_weather("Rain"),
-                "Heavy_Rain": is_weather("Heavy_Rain"),
-                "Snow": is_weather("Snow"),
-                "Heavy_Snow": is_weather("Heavy_Snow"),
-                "Fog": is_weather("Fog"),
-                "Month": month,
-                "Weekday": weekday,
-                "Hour": hour,
-            }
-        ]
-
-        features_aligned = preprocess_input_data(features)
-        prediction = model.predict(
-            features_aligned.values
-            if model_choice == "Decision Trees"
-            else features_aligned
-        )
-        severity_map = {1: "Low Impact", 2: "Minor", 3: "Moderate", 4: "Serious"}    
+        features = {
+            "City": city,
+            "County": county,
+            "State": state,
+            "Temperature(F)": temperature,
+            "Humidity(%)": humidity,
+            "Pressure(in)": pressure,
+            "Visibility(mi)": visibility,
+            "Wind_Direction": wind_direction,
+            "Wind_Speed(mph)": wind_speed,
+            "Precipitation(in)": precipitation,
+            "Amenity": has_route_feature("Amenity"),
+            "Bump": has_route_feature("Bump"),
+            "Crossing": has_route_feature("Crossing"),
+            "Give_Way": has_route_feature("Give_Way"),
+            "Junction": has_route_feature("Junction"),
+            "No_Exit": has_route_feature("No_Exit"),
+            "Railway": has_route_feature("Railway"),
+            "Roundabout": has_route_feature("Roundabout"),
+            "Station": has_route_feature("Station"),
+            "Stop": has_route_feature("Stop"),
+            "Traffic_Calming": has_route_feature("Traffic_Calming"),
+            "Traffic_Signal": has_route_feature("Traffic_Signal"),
+            "Sunrise_Sunset": time_of_day,
+            "Civil_Twilight": time_of_day,
+            "Nautical_Twilight": time_of_day,
+            "Astronomical_Twilight": time_of_day,
+            "Clear": is_weather("Clear"),
+            "Cloud": is_weather("Cloud"),
+            "Rain": is_weather("Rain"),
+            "Heavy_Rain": is_weather("Heavy_Rain"),
+            "Snow": is_weather("Snow"),
+            "Heavy_Snow": is_weather("Heavy_Snow"),
+            "Fog": is_weather("Fog"),
+            "Month": month,
+            "Weekday": weekday,
+            "Hour": hour,
+        }
+
+        if service_url:
+            result = predict_remote(service_url, model_choice, features)
+            prediction = [result["severity"]]
+        else:
+            model = choose_model(model_choice)
+            if model is None:
+                st.error("Model not implemented yet.")
+                st.stop()
+
+            # Written straight into the model's column layout, no DataFrame round trip
+            features_aligned = registry.encoder().encode(features)[np.newaxis]
+            prediction = model.predict(features_aligned)
+        severity_map = {1: "Low Impact", 2: "Minor", 3: "Moderate", 4: "Serious"}
 
         st.markdown(
             "If an accident were to happen under these conditions, the predicted severity would be:"
         )
-        st.success(f"{severity_map[prediction[0]]} (**{prediction[0]}** out of 4 severity)")
+        st.success(
+            f"{severity_map[prediction[0]]} (**{prediction[0]}** out of 4 severity)"
+        )
         st.markdown(
             "_Note: the severity is a number between 1 and 4, where 1 is the least severe and 4 is the most severe_"
         )
+
+if not service_url:
+    with st.expander("Model registry metrics"):
+        st.write(pd.DataFrame(registry.metrics()).T)
+
+    # Only shown for models trained with DecisionTree(instrument=True)
+    # peek, so reruns don't count as hits or keep the model in the cache
+    tree_stats = getattr(registry.peek(model_choice), "stats_", None)
+    if tree_stats is not None:
+        with st.expander("Decision tree training statistics"):
+            st.write(pd.Series(tree_stats.snapshot(), name="value"))
+            st.dataframe(pd.DataFrame(tree_stats.by_depth()).set_index("depth"))
@@ -0,0 +1,66 @@
+import numpy as np
+
+
+class AccidentCube:
+    # Accident counts and severity sums by Year/State/City, rolled up once
+    COLUMNS = ["accidents", "severity_count", "severity_sum"]
+
+    def __init__(self, df):
+        cells = df.groupby(["Year", "State", "City"], observed=True, dropna=False)[
+            "Severity"
+        ].agg(["size", "count", "sum"])
+        cells.columns = self.COLUMNS
+
+        years = cells.groupby(level="Year").sum()
+        self.min_year = int(years.index.min())
+        self.max_year = int(years.index.max())
+        self._years = {int(year): row for year, row in years.iterrows()}
+
+        # Rows with a missing State or City drop out here, as in a plain groupby
+        cells = cells.reset_index()
+        self._states = self._rank(
+            cells.groupby(["Year", "State"], observed=True)[self.COLUMNS].sum()
+        )
+        self._cities = self._rank(
+            cells.groupby(["Year", "City", "State"], observed=True)[self.COLUMNS].sum()
+        )
+
+    def year_summary(self, year):
+        row = self._years.get(year)
+        if row is None:
+            return 0, np.nan
+        return int(row["accidents"]), self._mean_severity(row)
+
+    def top_states(self, year, n=5):
+        ranked = self._states.get(year)
+        if ranked is None:
+            return []
+        return [
+            (state, int(row["accidents"]), self._mean_severity(row))
+            for state, row in ranked.head(n).iterrows()
+        ]
+
+    def top_cities(self, year, n=5):
+        ranked = self._cities.get(year)
+        if ranked is None:
+            return []
+        return [
+            (city, state, int(row["accidents"]), self._mean_severity(row))
+            for (city, state), row in ranked.head(n).iterrows()
+        ]
+
+    @staticmethod
+    def _rank(frame):
+        # One frame per year, already sorted so a lookup is just head(n)
+        return {
+            int(year): group.droplevel("Year").sort_values(
+                "accidents", ascending=False, kind="stable"
+            )
+            for year, group in frame.groupby(level="Year")
+        }
+
+    @staticmethod
+    def _mean_severity(row):
+        if not row["severity_count"]:
+            return np.nan
+        return row["severity_sum"] / row["severity_count"]
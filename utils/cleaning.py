@@ -0,0 +1,268 @@
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Columns the notebooks drop: not useful, a single unique value, or too sparse
+DROP_COLUMNS = [
+    "ID",
+    "Source",
+    "End_Time",
+    "End_Lat",
+    "End_Lng",
+    "Distance(mi)",
+    "Description",
+    "Weather_Timestamp",
+    "Country",
+    "Turning_Loop",
+    "Wind_Chill(F)",
+]
+
+REQUIRED_COLUMNS = [
+    "Street",
+    "City",
+    "Zipcode",
+    "Airport_Code",
+    "Sunrise_Sunset",
+    "Civil_Twilight",
+    "Nautical_Twilight",
+    "Astronomical_Twilight",
+    "Wind_Direction",
+    "Precipitation(in)",
+]
+
+MEDIAN_COLUMNS = [
+    "Temperature(F)",
+    "Humidity(%)",
+    "Pressure(in)",
+    "Visibility(mi)",
+    "Wind_Speed(mph)",
+]
+
+DIRECTION_MAPPING = {
+    "Calm": "CALM",
+    "West": "W",
+    "WSW": "W",
+    "WNW": "W",
+    "South": "S",
+    "SSW": "S",
+    "SSE": "S",
+    "North": "N",
+    "NNW": "N",
+    "NNE": "N",
+    "East": "E",
+    "ESE": "E",
+    "ENE": "E",
+    "Variable": "VAR",
+}
+
+WEATHER_CONDITIONS = {
+    "Clear": "Clear",
+    "Cloud": "Cloud|Overcast",
+    "Rain": "Rain|storm",
+    "Heavy_Rain": "Heavy Rain|Rain Shower|Heavy T-Storm|Heavy Thunderstorms",
+    "Snow": "Snow|Sleet|Ice",
+    "Heavy_Snow": "Heavy Snow|Heavy Sleet|Heavy Ice Pellets|Snow Showers|Squalls",
+    "Fog": "Fog",
+}
+
+# Text columns are read as strings so every chunk gets the same schema
+STRING_COLUMNS = [
+    "Street",
+    "City",
+    "County",
+    "State",
+    "Zipcode",
+    "Timezone",
+    "Airport_Code",
+    "Wind_Direction",
+    "Weather_Condition",
+    "Sunrise_Sunset",
+    "Civil_Twilight",
+    "Nautical_Twilight",
+    "Astronomical_Twilight",
+]
+
+
+def read_chunks(raw_path, chunk_size):
+    return pd.read_csv(
+        raw_path,
+        chunksize=chunk_size,
+        dtype={column: str for column in STRING_COLUMNS},
+    )
+
+
+def simplify_wind_direction(directions):
+    return directions.map(DIRECTION_MAPPING).fillna(directions)
+
+
+def weather_flags(conditions):
+    # The regexes run once per distinct condition, rows only gather the result
+    codes, uniques = pd.factorize(conditions)
+    uniques = pd.Series(uniques)
+    flags = {}
+    for column, pattern in WEATHER_CONDITIONS.items():
+        matches = uniques.str.contains(pattern, case=False).to_numpy(dtype=bool)
+        # A missing condition ends up True in every flag, as in the notebook
+        flags[column] = np.append(matches, True)[codes]
+    return pd.DataFrame(flags, index=conditions.index)
+
+
+def time_features(start_time):
+    # Fractional seconds are stripped first, as the sampling notebook does
+    start_time = pd.to_datetime(start_time.str.replace(r"\.\d+", "", regex=True))
+    return pd.DataFrame(
+        {
+            "Year": start_time.dt.year,
+            "Month": start_time.dt.month,
+            "Weekday": start_time.dt.weekday,
+            "Hour": start_time.dt.hour,
+        },
+        index=start_time.index,
+    )
+
+
+def clean_chunk(chunk, medians):
+    chunk = chunk.drop(columns=DROP_COLUMNS, errors="ignore")
+    chunk["Wind_Direction"] = simplify_wind_direction(chunk["Wind_Direction"])
+    chunk = pd.concat(
+        [
+            chunk.drop(columns=["Weather_Condition", "Start_Time"]),
+            weather_flags(chunk["Weather_Condition"]),
+            time_features(chunk["Start_Time"]),
+        ],
+        axis=1,
+    )
+    chunk = chunk.dropna(subset=REQUIRED_COLUMNS)
+    return chunk.fillna(medians)
+
+
+def clean_dataset(
+    raw_path,
+    output_dir,
+    chunk_size=200_000,
+    undersample=True,
+    random_state=42,
+    partition_cols=("Year",),
+    progress=None,
+):
+    # Pass 1: class sizes, so undersampling can pick its rows up front
+    selection = None
+    if undersample:
+        class_counts = pd.Series(dtype=np.int64)
+        for chunk in read_chunks(raw_path, chunk_size):
+            chunk = chunk.dropna(subset=["Precipitation(in)"])
+            class_counts = class_counts.add(
+                chunk["Severity"].value_counts(), fill_value=0
+            )
+        selection = _undersample_selection(class_counts.astype(np.int64), random_state)
+
+    # Pass 2: exact global medians, accumulated as value counts
+    value_counts = {column: pd.Series(dtype=np.int64) for column in MEDIAN_COLUMNS}
+    for chunk in _selected_chunks(raw_path, chunk_size, selection):
+        chunk = chunk.dropna(subset=REQUIRED_COLUMNS)
+        for column in MEDIAN_COLUMNS:
+            value_counts[column] = value_counts[column].add(
+                chunk[column].value_counts(), fill_value=0
+            )
+    medians = {
+        column: _median_from_counts(counts) for column, counts in value_counts.items()
+    }
+
+    # Pass 3: clean every chunk and append it to the partitioned dataset
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    rows_in = rows_out = 0
+    schema = None
+    for chunk in _selected_chunks(raw_path, chunk_size, selection):
+        rows_in += len(chunk)
+        cleaned = clean_chunk(chunk, medians)
+        rows_out += len(cleaned)
+        if cleaned.empty:
+            continue
+        table = pa.Table.from_pandas(cleaned, schema=schema, preserve_index=False)
+        schema = table.schema
+        pq.write_to_dataset(table, output_dir, partition_cols=list(partition_cols))
+        if progress is not None:
+            progress(rows_in, rows_out)
+
+    return {"rows_in": rows_in, "rows_out": rows_out, "medians": medians}
+
+
+def _selected_chunks(raw_path, chunk_size, selection):
+    # Rows of each class are numbered in file order, selection keeps a subset
+    seen = {}
+    for chunk in read_chunks(raw_path, chunk_size):
+        chunk = chunk.dropna(subset=["Precipitation(in)"])
+        if selection is None:
+            yield chunk
+            continue
+
+        keep = np.zeros(len(chunk), dtype=bool)
+        severity = chunk["Severity"].to_numpy()
+        for level in np.unique(severity):
+            in_class = severity == level
+            start = seen.get(level, 0)
+            seen[level] = start + in_class.sum()
+            keep[in_class] = selection[level][start : seen[level]]
+        yield chunk[keep]
+
+
+def _undersample_selection(class_counts, random_state):
+    # Every class is cut down to the size of the smallest one
+    rng = np.random.default_rng(random_state)
+    target = class_counts.min()
+    selection = {}
+    for level, count in class_counts.items():
+        mask = np.zeros(count, dtype=bool)
+        mask[rng.choice(count, size=target, replace=False)] = True
+        selection[level] = mask
+    return selection
+
+
+def _median_from_counts(counts):
+    counts = counts.sort_index()
+    if counts.empty:
+        return np.nan
+    total = counts.sum()
+    cumulative = counts.cumsum().to_numpy()
+    values = counts.index.to_numpy(dtype=np.float64)
+    lower = values[np.searchsorted(cumulative, (total + 1) // 2)]
+    upper = values[np.searchsorted(cumulative, total // 2 + 1)]
+    return (lower + upper) / 2
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Clean the raw US Accidents CSV in chunks into a Parquet dataset"
+    )
+    parser.add_argument("raw", help="raw US_Accidents CSV")
+    parser.add_argument("output", help="output directory for the partitioned dataset")
+    parser.add_argument("--chunk-size", type=int, default=200_000)
+    parser.add_argument(
+        "--no-undersample",
+        action="store_true",
+        help="keep every row instead of balancing the severity classes",
+    )
+    parser.add_argument("--random-state", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    report = clean_dataset(
+        args.raw,
+        args.output,
+        chunk_size=args.chunk_size,
+        undersample=not args.no_undersample,
+        random_state=args.random_state,
+        progress=lambda rows_in, rows_out: print(
+            f"{rows_in} rows read, {rows_out} rows written"
+        ),
+    )
+    print(f"Medians: {report['medians']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import io
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from utils.schema import CATEGORY_COLUMNS, compact_frame
+
+CACHE_DIR = ".cache"
+# Bump when the cached frame changes shape so old cache files are not reused
+CACHE_VERSION = 3
+
+
+class _ByteCountingReader(io.RawIOBase):
+    # Reports how far into the file the CSV parser has read
+    def __init__(self, file, on_read):
+        self._file = file
+        self._on_read = on_read
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        num_bytes = self._file.readinto(buffer)
+        self._on_read(self._file.tell())
+        return num_bytes
+
+
+def dataset_fingerprint(csv_path):
+    # Size and mtime of the source, so any edit invalidates everything derived
+    stat = os.stat(csv_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def cache_file(csv_path, suffix):
+    directory, name = os.path.split(os.path.abspath(csv_path))
+    stem = os.path.splitext(name)[0]
+    return os.path.join(
+        directory, CACHE_DIR, f"{stem}.{dataset_fingerprint(csv_path)}.{suffix}"
+    )
+
+
+def cache_path(csv_path):
+    return cache_file(csv_path, f"data-v{CACHE_VERSION}.arrow")
+
+
+def load_dataset(csv_path, progress=None, chunk_size=100_000):
+    path = cache_path(csv_path)
+    if not os.path.exists(path):
+        _build_cache(csv_path, path, progress, chunk_size)
+    elif progress is not None:
+        progress(1.0)
+    return read_cache(path)
+
+
+def read_cache(path):
+    # Uncompressed Arrow IPC is memory-mapped, numeric columns are not copied.
+    # The cache already holds the compacted frame, categories as dictionaries
+    # and timestamps as native columns, so nothing is parsed on load
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    data = table.to_pandas(split_blocks=True)
+    # Dictionaries are written in order of first appearance, sort them so the
+    # categories match what compact_frame gives for the whole frame
+    for column in data.select_dtypes(include="category").columns:
+        categories = data[column].cat.categories
+        if not categories.is_monotonic_increasing:
+            data[column] = data[column].cat.reorder_categories(categories.sort_values())
+    with open(path + ".report.json") as file:
+        data.attrs["compact_report"] = json.load(file)
+    return data
+
+
+def _build_cache(csv_path, path, progress, chunk_size):
+    total_bytes = max(os.path.getsize(csv_path), 1)
+    reported = [0.0]
+
+    def on_read(position):
+        # Only report whole-percent steps so the UI is not flooded
+        fraction = min(position / total_bytes, 1.0)
+        if progress is not None and fraction - reported[0] >= 0.01:
+            reported[0] = fraction
+            progress(fraction)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _remove_stale_caches(csv_path, path)
+
+    # Each chunk is compacted and written as it is read, so only one raw chunk
+    # is held at a time. Write to a temporary name first so a half-written
+    # cache is never read
+    report = {"bytes_before": 0, "bytes_after": 0}
+    dictionaries = {}
+    writer = None
+    try:
+        with open(csv_path, "rb") as raw:
+            reader = io.BufferedReader(_ByteCountingReader(raw, on_read))
+            # Text columns are read as strings, otherwise every chunk guesses
+            # its own dtype and a chunk of 5-digit zipcodes parses as int
+            for chunk in pd.read_csv(
+                reader,
+                chunksize=chunk_size,
+                dtype={column: str for column in CATEGORY_COLUMNS},
+                low_memory=False,
+            ):
+                chunk, sizes = compact_frame(chunk)
+                report["bytes_before"] += sizes["bytes_before"]
+                # Category labels are counted once per column below, not per chunk
+                report["bytes_after"] += sizes["bytes_after"] - sum(
+                    _label_bytes(chunk[column].cat.categories)
+                    for column in chunk.select_dtypes(include="category").columns
+                )
+                if writer is None:
+                    schema = _cache_schema(chunk)
+                    writer = pa.ipc.new_file(
+                        path + ".tmp",
+                        schema,
+                        options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True),
+                    )
+                writer.write_batch(_record_batch(chunk, schema, dictionaries))
+    finally:
+        if writer is not None:
+            writer.close()
+    report["bytes_after"] += sum(
+        _label_bytes(list(codes_by_label))
+        for codes_by_label, _ in dictionaries.values()
+    )
+    if progress is not None:
+        progress(1.0)
+
+    with open(path + ".report.json", "w") as file:
+        json.dump(report, file)
+    os.replace(path + ".tmp", path)
+
+
+def _cache_schema(chunk):
+    # Fixed from the first chunk. Text columns that are empty there would be
+    # typed null, and categories are dictionaries shared by every batch
+    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+    for index, field in enumerate(schema):
+        if isinstance(chunk[field.name].dtype, pd.CategoricalDtype):
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+        elif pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        schema = schema.set(index, field)
+    return schema
+
+
+def _record_batch(chunk, schema, dictionaries):
+    arrays = []
+    for field in schema:
+        values = chunk[field.name]
+        if pa.types.is_dictionary(field.type):
+            state = dictionaries.setdefault(field.name, ({}, []))
+            arrays.append(_dictionary_array(values, *state))
+        else:
+            arrays.append(pa.Array.from_pandas(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _label_bytes(labels):
+    return int(pd.Index(labels, dtype=object).memory_usage(deep=True))
+
+
+def _dictionary_array(values, codes_by_label, pieces):
+    # Each chunk has its own categories. They are mapped onto one dictionary
+    # per column that only grows, so every batch extends the previous one and
+    # the writer stores just the new labels as a delta
+    categories = values.cat.categories
+    new_labels = [label for label in categories if label not in codes_by_label]
+    for label in new_labels:
+        codes_by_label[label] = len(codes_by_label)
+    if new_labels or not pieces:
+        pieces.append(pa.array(new_labels, type=pa.string()))
+    # Code -1 marks missing values and maps to the trailing -1
+    mapping = np.array(
+        [codes_by_label[label] for label in categories] + [-1], dtype=np.int32
+    )
+    codes = mapping[values.cat.codes.to_numpy()]
+    return pa.DictionaryArray.from_arrays(
+        pa.array(codes, mask=codes < 0), pa.concat_arrays(pieces)
+    )
+
+
+def _remove_stale_caches(csv_path, path):
+    # Drops every cache file, summaries included, left by older fingerprints.
+    # Names are <stem>.<fingerprint>.<suffix> and the stem may hold dots, so
+    # the fingerprint is only read right after this dataset's whole stem
+    directory = os.path.dirname(path)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    pattern = re.compile(re.escape(stem) + r"\.(\d+-\d+)\..+")
+    fingerprint = dataset_fingerprint(csv_path)
+    for entry in os.listdir(directory):
+        match = pattern.fullmatch(entry)
+        if match is not None and match.group(1) != fingerprint:
+            os.remove(os.path.join(directory, entry))
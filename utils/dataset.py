@@ -0,0 +1,76 @@
+import os
+import threading
+
+from utils.aggregates import AccidentCube
+from utils.data_loader import cache_file, load_dataset
+from utils.density import render_density_map
+from utils.spatial import SpatialIndex
+from utils.summaries import load_summaries, summary_path
+
+DATA_PATH = "./data/US_Accidents_March23_random_sample.csv"
+
+# One compacted frame per process, shared read-only by every session
+_datasets = {}
+_cubes = {}
+_summaries = {}
+_density_maps = {}
+_spatial_indexes = {}
+_lock = threading.RLock()
+
+
+def get_dataset(path=DATA_PATH, progress=None):
+    # Concurrent first visitors wait for a single parse instead of each loading
+    with _lock:
+        if path not in _datasets:
+            # The cache is written compacted, so loading converts nothing
+            _datasets[path] = load_dataset(path, progress=progress)
+    return _datasets[path]
+
+
+def get_cube(path=DATA_PATH):
+    # Built once per loaded dataset, then every slider move is a lookup
+    with _lock:
+        if path not in _cubes:
+            _cubes[path] = AccidentCube(get_dataset(path))
+    return _cubes[path]
+
+
+def get_spatial_index(path=DATA_PATH):
+    with _lock:
+        if path not in _spatial_indexes:
+            _spatial_indexes[path] = SpatialIndex(get_dataset(path))
+    return _spatial_indexes[path]
+
+
+def get_summaries(path=DATA_PATH):
+    # Keyed by the dataset fingerprint, read from disk after the first run
+    key = summary_path(path)
+    with _lock:
+        if key not in _summaries:
+            _summaries[key] = load_summaries(path, lambda: get_dataset(path))
+    return _summaries[key]
+
+
+def get_density_map(zoom=1, path=DATA_PATH):
+    # PNG bytes per dataset fingerprint and zoom level, persisted like summaries
+    key = cache_file(path, f"density-v2-z{zoom}.png")
+    with _lock:
+        if key not in _density_maps:
+            if os.path.exists(key):
+                with open(key, "rb") as file:
+                    _density_maps[key] = file.read()
+            else:
+                _density_maps[key] = render_density_map(get_dataset(path), zoom)
+                os.makedirs(os.path.dirname(key), exist_ok=True)
+                with open(key + ".tmp", "wb") as file:
+                    file.write(_density_maps[key])
+                os.replace(key + ".tmp", key)
+    return _density_maps[key]
+
+
+def dataset_report(path=DATA_PATH):
+    return _datasets[path].attrs["compact_report"]
+
+
+def is_loaded(path=DATA_PATH):
+    return path in _datasets
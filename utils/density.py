@@ -0,0 +1,86 @@
+import io
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+
+ALL_COLOR = (0.0, 0.5, 0.5)
+SEVERE_COLOR = (1.0, 0.0, 0.0)
+FIGSIZE = (15, 10)
+# Resolution grows with the zoom so every grid cell keeps its own pixel
+BASE_DPI = 100
+MAX_DPI = 200
+
+
+def density_grid(lng, lat, extent, shape):
+    # Rows are latitude bins from south to north, columns longitude bins
+    west, east, south, north = extent
+    counts, _, _ = np.histogram2d(
+        lat, lng, bins=shape, range=[[south, north], [west, east]]
+    )
+    return counts
+
+
+def density_layer(counts, color, max_alpha):
+    # Log scaling keeps sparse cells visible next to dense cities
+    alpha = np.log1p(counts) / np.log1p(max(counts.max(), 1)) * max_alpha
+    alpha[counts > 0] = np.maximum(alpha[counts > 0], 0.15 * max_alpha)
+    layer = np.zeros(counts.shape + (4,))
+    layer[..., :3] = color
+    layer[..., 3] = alpha
+    return layer
+
+
+def composite(top, bottom):
+    # Standard "over" blending of two straight-alpha RGBA layers
+    alpha = top[..., 3:] + bottom[..., 3:] * (1 - top[..., 3:])
+    rgb = top[..., :3] * top[..., 3:] + bottom[..., :3] * bottom[..., 3:] * (
+        1 - top[..., 3:]
+    )
+    return np.concatenate([np.divide(rgb, alpha, where=alpha > 0), alpha], axis=-1)
+
+
+def render_density_map(df, zoom=1):
+    lng = df["Start_Lng"].to_numpy(dtype=np.float64)
+    lat = df["Start_Lat"].to_numpy(dtype=np.float64)
+    located = np.isfinite(lng) & np.isfinite(lat)
+    severe = (df["Severity"] == 4).to_numpy()[located]
+    lng, lat = lng[located], lat[located]
+    extent = (lng.min(), lng.max(), lat.min(), lat.max())
+
+    # A bare Figure needs no pyplot state, so sessions can render concurrently
+    fig = Figure(figsize=FIGSIZE)
+    ax = fig.subplots()
+    box = ax.get_position()
+    width, height = box.width * FIGSIZE[0], box.height * FIGSIZE[1]
+
+    # Each zoom level doubles the grid, the cost no longer depends on row count.
+    # The dpi follows the grid, and the grid is capped at the pixels the axes
+    # get at MAX_DPI, so a finer grid is never downsampled when drawn
+    rows, columns = 150 * 2**zoom, 240 * 2**zoom
+    dpi = min(max(BASE_DPI, columns / width, rows / height), MAX_DPI)
+    shape = (min(rows, int(height * dpi)), min(columns, int(width * dpi)))
+    all_counts = density_grid(lng, lat, extent, shape)
+    severe_counts = density_grid(lng[severe], lat[severe], extent, shape)
+    image = composite(
+        density_layer(severe_counts, SEVERE_COLOR, 0.9),
+        density_layer(all_counts, ALL_COLOR, 0.6),
+    )
+
+    ax.imshow(
+        image, extent=extent, origin="lower", aspect="auto", interpolation="nearest"
+    )
+    ax.legend(
+        handles=[
+            Patch(color=ALL_COLOR, alpha=0.6, label="All Accidents"),
+            Patch(
+                color=SEVERE_COLOR, alpha=0.9, label="Accidents with Serverity Level 4"
+            ),
+        ]
+    )
+    ax.set_xlabel("Longitude", size=12, labelpad=3)
+    ax.set_ylabel("Latitude", size=12, labelpad=3)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+    return buffer.getvalue()
@@ -0,0 +1,86 @@
+import pandas as pd
+
+CATEGORY_COLUMNS = [
+    "Source",
+    "Street",
+    "City",
+    "County",
+    "State",
+    "Zipcode",
+    "Country",
+    "Timezone",
+    "Airport_Code",
+    "Wind_Direction",
+    "Weather_Condition",
+    "Sunrise_Sunset",
+    "Civil_Twilight",
+    "Nautical_Twilight",
+    "Astronomical_Twilight",
+]
+
+BOOLEAN_COLUMNS = [
+    "Amenity",
+    "Bump",
+    "Crossing",
+    "Give_Way",
+    "Junction",
+    "No_Exit",
+    "Railway",
+    "Roundabout",
+    "Station",
+    "Stop",
+    "Traffic_Calming",
+    "Traffic_Signal",
+    "Turning_Loop",
+    "Clear",
+    "Cloud",
+    "Rain",
+    "Heavy_Rain",
+    "Snow",
+    "Heavy_Snow",
+    "Fog",
+]
+
+FLOAT32_COLUMNS = [
+    "Distance(mi)",
+    "Temperature(F)",
+    "Wind_Chill(F)",
+    "Humidity(%)",
+    "Pressure(in)",
+    "Visibility(mi)",
+    "Wind_Speed(mph)",
+    "Precipitation(in)",
+]
+
+ACCIDENT_SCHEMA = {
+    **{column: "category" for column in CATEGORY_COLUMNS},
+    **{column: "boolean" for column in BOOLEAN_COLUMNS},
+    **{column: "float32" for column in FLOAT32_COLUMNS},
+    "Severity": "int8",
+    "Year": "int16",
+    "Month": "int8",
+    "Weekday": "int8",
+    "Hour": "int8",
+}
+
+DATETIME_COLUMNS = ["Start_Time", "End_Time", "Weather_Timestamp"]
+
+
+def compact_frame(df, schema=ACCIDENT_SCHEMA):
+    # Returns the converted frame and its deep memory usage before and after.
+    # Columns are replaced on a shallow copy, the caller's frame is untouched
+    # and columns outside the schema are shared rather than copied
+    bytes_before = int(df.memory_usage(deep=True).sum())
+
+    df = df.copy(deep=False)
+    for column in DATETIME_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors="coerce")
+    if "Start_Time" in df.columns and "Year" not in df.columns:
+        df["Year"] = df["Start_Time"].dt.year
+    for column, dtype in schema.items():
+        if column in df.columns and df[column].dtype != dtype:
+            df[column] = df[column].astype(dtype)
+
+    bytes_after = int(df.memory_usage(deep=True).sum())
+    return df, {"bytes_before": bytes_before, "bytes_after": bytes_after}
@@ -0,0 +1,70 @@
+import numpy as np
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_MILES = 3958.8
+
+
+class SpatialIndex:
+    # Haversine ball tree over Start_Lat/Start_Lng, built once per dataset
+    def __init__(self, df):
+        lat = df["Start_Lat"].to_numpy(dtype=np.float64)
+        lng = df["Start_Lng"].to_numpy(dtype=np.float64)
+        located = np.isfinite(lat) & np.isfinite(lng)
+
+        self.df = df
+        # Tree positions map back to frame rows through this array
+        self.rows = np.flatnonzero(located)
+        self.severity = df["Severity"].to_numpy(dtype=np.float64)
+        self.tree = BallTree(
+            np.radians(np.column_stack([lat[located], lng[located]])),
+            metric="haversine",
+        )
+
+        places = df.loc[located].groupby(["State", "City"], observed=True)
+        self.places = {
+            place: (row["Start_Lat"], row["Start_Lng"])
+            for place, row in places[["Start_Lat", "Start_Lng"]].mean().iterrows()
+        }
+
+    def radius(self, lat, lng, miles):
+        # Frame row positions and distances in miles, nearest first
+        positions, distances = self.tree.query_radius(
+            self._point(lat, lng),
+            r=miles / EARTH_RADIUS_MILES,
+            return_distance=True,
+            sort_results=True,
+        )
+        return self.rows[positions[0]], distances[0] * EARTH_RADIUS_MILES
+
+    def nearest(self, lat, lng, k=10):
+        k = min(k, len(self.rows))
+        distances, positions = self.tree.query(self._point(lat, lng), k=k)
+        return self.rows[positions[0]], distances[0] * EARTH_RADIUS_MILES
+
+    def radius_frame(self, lat, lng, miles):
+        rows, distances = self.radius(lat, lng, miles)
+        return self.df.iloc[rows].assign(**{"Distance_From_Point(mi)": distances})
+
+    def nearest_frame(self, lat, lng, k=10):
+        rows, distances = self.nearest(lat, lng, k)
+        return self.df.iloc[rows].assign(**{"Distance_From_Point(mi)": distances})
+
+    def severity_stats(self, rows):
+        severity = self.severity[rows]
+        severity = severity[np.isfinite(severity)]
+        levels, counts = np.unique(severity.astype(np.int64), return_counts=True)
+        return {
+            "accidents": len(rows),
+            "mean_severity": severity.mean() if len(severity) else np.nan,
+            "severity_counts": dict(zip(levels.tolist(), counts.tolist())),
+        }
+
+    def radius_stats(self, lat, lng, miles):
+        return self.severity_stats(self.radius(lat, lng, miles)[0])
+
+    def place(self, state, city):
+        return self.places.get((state, city))
+
+    @staticmethod
+    def _point(lat, lng):
+        return np.radians([[lat, lng]])
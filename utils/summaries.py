@@ -0,0 +1,44 @@
+import os
+
+import pandas as pd
+
+from utils.data_loader import cache_file
+
+# Bump when the summaries change shape so old cache files are not reused
+SUMMARY_VERSION = 1
+
+
+def summary_path(csv_path):
+    return cache_file(csv_path, f"summaries-v{SUMMARY_VERSION}.pkl")
+
+
+def load_summaries(csv_path, load_frame):
+    path = summary_path(csv_path)
+    if os.path.exists(path):
+        return pd.read_pickle(path)
+
+    summaries = compute_summaries(load_frame())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pd.to_pickle(summaries, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return summaries
+
+
+def compute_summaries(df):
+    null_counts = df.isnull().sum()
+    non_null_counts = df.notnull().sum()
+    return {
+        "describe": df.describe(),
+        "dtypes": pd.DataFrame(df.dtypes.astype(str), columns=["Data Type"]).T,
+        "missing": pd.DataFrame(
+            {
+                "Null Value Count": null_counts,
+                "Non-Null Value Count": non_null_counts,
+                "Percentage": round(null_counts / df.shape[0] * 100, 2),
+            }
+        ).T,
+        "year_counts": df["Year"].value_counts().sort_index(),
+        "hour_counts": df["Start_Time"].dt.hour.value_counts(),
+        "weather_counts": df["Weather_Condition"].value_counts().head(10),
+        "state_counts": df["State"].value_counts(),
+    }